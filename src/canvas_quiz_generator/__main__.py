@@ -1,19 +1,52 @@
 import argparse
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
 import logging
+import os
 from pathlib import Path
-import re
+import random
 import shutil
 import sys
+import tempfile
+import time
 import traceback
+from typing import Any, TypeVar
 
-from canvas_quiz_generator.config import GeneratorConfig
-from canvas_quiz_generator.logic import execute_format_conversion, generate_variant, quiz_str_list_to_bank
+from canvas_quiz_generator.config import BANK_NAME_PATTERN, BankConfig, GeneratorConfig, ManifestConfig
+from canvas_quiz_generator.index import BankIndex, IndexChanges
+from canvas_quiz_generator.memprofile import MemoryProfiler
+from canvas_quiz_generator.logic import (
+    BuildCache,
+    QuizParts,
+    RenderCache,
+    check_input,
+    execute_format_conversion,
+    generate_variants,
+    merge_partial_banks,
+    quiz_str_list_to_bank,
+    quiz_str_list_to_partial_bank,
+)
+from canvas_quiz_generator.publish import CanvasClient
+from canvas_quiz_generator.report import BuildReport, InputReport
 
 
 _logger = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
 
 def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "build-all":
+        build_all(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "publish":
+        publish(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "merge":
+        merge(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser()
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable more logging.")
     parser.add_argument(
@@ -35,9 +68,8 @@ def main() -> None:
     parser.add_argument(
         "-o",
         "--output",
-        required=True,
         type=Path,
-        help="Path to the empty directory where generated quizzes should be be placed.",
+        help="Path to the empty directory where generated quizzes should be be placed. (Required unless --check.)",
     )
     parser.add_argument(
         "--clear-output-dir",
@@ -47,83 +79,910 @@ def main() -> None:
     parser.add_argument(
         "--bank-name", default="quiz_bank", help="Question bank name to use in Canvas and for the generated files."
     )
+    parser.add_argument(
+        "--max-items-per-package",
+        type=int,
+        help="Split the quiz bank into multiple QTI packages, each containing at most this many quizzes.",
+    )
+    parser.add_argument(
+        "--max-package-bytes",
+        type=int,
+        help="Split the quiz bank into multiple QTI packages, each containing approximately at most this many bytes"
+        " of text-format quizzes.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of QTI packages to build in parallel, or processes converting the questions"
+        " if there is only one package. (Default: 1)",
+    )
+    parser.add_argument(
+        "--previous-index",
+        type=Path,
+        help="Path to the index of a previous build to compare the quizzes to. (Implies --index.)"
+        " By default, the index found in the output directory is used.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After building the quiz bank, keep rebuilding it whenever an input or configuration file changes."
+        " Only the affected input-config pairs are generated again.",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only validate the configurations and check that the quiz descriptions contain their placeholders"
+        " and answer fields, without generating anything. Exits with a nonzero code if a problem is found.",
+    )
+    parser.add_argument(
+        "--memprofile",
+        action="store_true",
+        help="Measure the memory usage of the stages of the build and report the peaks, the retained memory"
+        " and the top allocation sites. (Slow, and processes started via --jobs are not measured.)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=_shard_argument,
+        help="Only build the i-th of N parts of the quiz bank (specified as i/N), e.g. on one of N machines."
+        " The parts are assembled into a QTI package by the merge command.",
+    )
+    _add_build_arguments(parser)
     args = parser.parse_args()
     if len(args.input) != len(args.config):
         parser.error("You must provide the same number of --input and --config arguments.")
-
-    logging.basicConfig(
-        force=True,
-        level="DEBUG" if args.verbose else "INFO",
-        format="%(levelname)s [%(name)s] %(message)s" if args.verbose else "%(message)s",
-        stream=sys.stdout,
+    if args.output is None and not args.check:
+        parser.error("the following arguments are required: -o/--output")
+    if args.shard is not None:
+        for name in ("watch", "index", "previous_index", "max_items_per_package", "max_package_bytes"):
+            if getattr(args, name):
+                parser.error(f"The --{name.replace('_', '-')} argument cannot be used together with --shard.")
+        if args.sample is not None and args.seed is None:
+            parser.error("The --sample argument requires --seed when used with --shard, so that all parts agree.")
+    _check_positive_arguments(
+        parser, args, ["max_items_per_package", "max_package_bytes", "jobs", "preview_page_size", "sample"]
     )
+    _configure_logging(args.verbose)
 
     for input in args.input:
         if not input.exists() or not input.is_file():
             _logger.error("The specified input file does not exist: '%s'", input)
             exit(-1)
 
+    if args.check:
+        exit(0 if _check(args) else -1)
+
+    # The files are checked for changes relative to their state before they were loaded
+    signatures = {path: _file_signature(path) for path in [*args.input, *args.config]} if args.watch else {}
+    memory_profiler = MemoryProfiler() if args.memprofile else None
     configs = []  # Parsed configurations and the path they were loaded from
-    for config in args.config:
-        if not config.exists() or not config.is_file():
-            _logger.error("The specified configuration file does not exist: '%s'", config)
+    with contextlib.nullcontext() if memory_profiler is None else memory_profiler.stage("config loading"):
+        for config in args.config:
+            if not config.exists() or not config.is_file():
+                _logger.error("The specified configuration file does not exist: '%s'", config)
+                exit(-1)
+            try:
+                # In watch mode, the pairs sharing a config must share the parsed config (it identifies their quizzes)
+                if args.watch and (shared := next((c for c, path in configs if path == config), None)) is not None:
+                    configs.append((shared, config))
+                    continue
+                _logger.debug("Loading configuration file '%s'...", config)
+                configs.append((_load_config(config, args), config))
+            except Exception as e:
+                _logger.debug("Exception caught when loading configuration", exc_info=True)
+                _logger.error("Failed to load configuration file: %s", traceback.format_exception_only(e)[0].strip())
+                exit(-1)
+
+    if not BANK_NAME_PATTERN.match(args.bank_name):
+        _logger.error("The specified bank name (%s) is not valid. Please don't use special characters.", args.bank_name)
+        exit(-1)
+
+    previous_index = None
+    try:
+        if args.previous_index is not None:
+            args.index = True
+            previous_index = BankIndex.load_from_json(args.previous_index)
+        elif args.index:
+            previous_index = _load_previous_index(args.output, args.bank_name)
+    except Exception as e:
+        _logger.debug("Exception caught when loading index", exc_info=True)
+        _logger.error("Failed to load previous index: %s", traceback.format_exception_only(e)[0].strip())
+        exit(-1)
+
+    try:
+        _prepare_output_dir(args.output, args.clear_output_dir)
+    except ValueError as e:
+        _logger.error("%s", e)
+        exit(-1)
+
+    render_cache = RenderCache() if args.watch else None
+    try:
+        _logger.debug("Generating quizzes...")
+        execute_logic(
+            list(zip(args.input, configs)),
+            args.output,
+            args.bank_name,
+            max_items_per_package=args.max_items_per_package,
+            max_package_bytes=args.max_package_bytes,
+            jobs=args.jobs,
+            previous_index=previous_index,
+            render_cache=render_cache,
+            memory_profiler=memory_profiler,
+            shard=args.shard,
+            **_build_options(args),
+        )
+    except Exception as e:
+        _logger.debug("Exception caught when generating quizzes", exc_info=True)
+        _logger.error("Failed to generate quizzes: %s", traceback.format_exception_only(e)[0].strip())
+        if render_cache is None:
             exit(-1)
+    finally:
+        # Tracing slows everything down, and only the first build is profiled in watch mode
+        if memory_profiler is not None:
+            memory_profiler.stop()
+
+    if render_cache is not None:
+        loaded = {path: (signatures[path], config) for config, path in configs}
+        _watch(args, signatures, loaded, render_cache)
+
+
+def _shard_argument(value: str) -> tuple[int, int]:
+    """Parses the value of the --shard argument: the number of the part to build and the number of parts."""
+    try:
+        part, parts = (int(number) for number in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not in the i/N format, e.g. 1/4") from None
+    if not 1 <= part <= parts:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a valid part, i must be between 1 and N")
+    return part, parts
+
+
+def _check(args: argparse.Namespace) -> bool:
+    """
+    Validates the configs and checks each input-config pair without generating any variants,
+    logging every problem found. The inputs are converted in a temporary directory.
+    Returns whether no problems were found.
+    """
+    start = time.perf_counter()
+    problems = 0
+    configs: dict[Path, GeneratorConfig] = {}
+    for path in dict.fromkeys(args.config):
         try:
-            _logger.debug("Loading configuration file '%s'...", config)
-            configs.append((GeneratorConfig.load_from_json(config), config))
+            _logger.debug("Loading configuration file '%s'...", path)
+            configs[path] = _load_config(path, args)
         except Exception as e:
+            problems += 1
             _logger.debug("Exception caught when loading configuration", exc_info=True)
-            _logger.error("Failed to load configuration file: %s", traceback.format_exception_only(e)[0].strip())
-            exit(-1)
+            _logger.error("Invalid configuration file '%s': %s", path, traceback.format_exception_only(e)[0].strip())
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for input, config_path in zip(args.input, args.config):
+            if config_path not in configs:
+                continue
+            try:
+                missing_placeholders, missing_answer_fields = check_input(
+                    input, configs[config_path], Path(work_dir), not args.no_markdown_fast_path, args.minify_html
+                )
+            except Exception as e:
+                problems += 1
+                _logger.debug("Exception caught when checking input", exc_info=True)
+                _logger.error("Failed to check input '%s': %s", input, traceback.format_exception_only(e)[0].strip())
+                continue
+            pair = f"{input.name} - {config_path.name}"
+            for placeholder in missing_placeholders:
+                _logger.error("%s: Placeholder '%s' not found in quiz description.", pair, placeholder)
+            for answer_field in missing_answer_fields:
+                _logger.error("%s: Answer field '[%s]' not found in quiz description.", pair, answer_field)
+            problems += len(missing_placeholders) + len(missing_answer_fields)
+
+    _logger.info(
+        "Checked %d input-config pair(s) in %.3f s, %d problem(s) found.",
+        len(args.input),
+        time.perf_counter() - start,
+        problems,
+    )
+    return problems == 0
 
-    if not re.match(r"^[a-zA-Z0-9\._-]+$", args.bank_name):
-        _logger.error("The specified bank name (%s) is not valid. Please don't use special characters.")
+
+_WATCH_INTERVAL = 0.5
+"""The number of seconds between checking the watched files for changes."""
+
+
+def _watch(
+    args: argparse.Namespace,
+    signatures: dict[Path, tuple[int, int] | None],
+    loaded: dict[Path, tuple[tuple[int, int] | None, GeneratorConfig]],
+    render_cache: RenderCache,
+) -> None:
+    """
+    Rebuilds the quiz bank whenever an input or configuration file changes, until interrupted.
+    Only the modified configs are loaded again, and only the affected input-config pairs are converted and rendered,
+    the quizzes of the other pairs are taken from the render cache. Failed rebuilds are reported and skipped.
+    """
+    _logger.info("Watching %d files for changes, press Ctrl+C to stop...", len(signatures))
+    try:
+        while True:
+            time.sleep(_WATCH_INTERVAL)
+            changed = [path for path in signatures if _file_signature(path) != signatures[path]]
+            if not changed:
+                continue
+            for path in changed:
+                signatures[path] = _file_signature(path)
+
+            start = time.perf_counter()
+            try:
+                configs = []
+                for path in args.config:
+                    if path not in loaded or loaded[path][0] != signatures[path]:
+                        _logger.debug("Loading configuration file '%s'...", path)
+                        loaded[path] = (signatures[path], _load_config(path, args))
+                    configs.append((loaded[path][1], path))
+                previous_index = _load_previous_index(args.output, args.bank_name) if args.index else None
+                intermediate_files = {
+                    path.name
+                    for path in args.output.iterdir()
+                    if any(path.name.startswith(f"{input.name}.") for input in args.input)
+                }
+                _remove_bank_files(args.output, args.bank_name, intermediate_files)
+                execute_logic(
+                    list(zip(args.input, configs)),
+                    args.output,
+                    args.bank_name,
+                    max_items_per_package=args.max_items_per_package,
+                    max_package_bytes=args.max_package_bytes,
+                    jobs=args.jobs,
+                    previous_index=previous_index,
+                    render_cache=render_cache,
+                    **_build_options(args),
+                )
+            except Exception as e:
+                _logger.debug("Exception caught when rebuilding the quiz bank", exc_info=True)
+                _logger.error("Failed to rebuild the quiz bank: %s", traceback.format_exception_only(e)[0].strip())
+                continue
+            _logger.info(
+                "Rebuilt the quiz bank in %.2f s after changes to: %s",
+                time.perf_counter() - start,
+                ", ".join(str(path) for path in changed),
+            )
+    except KeyboardInterrupt:
+        _logger.info("Stopped watching.")
+
+
+def _file_signature(path: Path) -> tuple[int, int] | None:
+    """The modification time and size of the file, or None if it doesn't exist (e.g. while it is being saved)."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _remove_bank_files(output: Path, bank_name: str, keep: set[str]) -> None:
+    """
+    Removes the files of the previous build of the quiz bank from the output directory, except the specified ones,
+    so that no outdated packages or preview pages are left behind if the bank got smaller.
+    """
+    for path in output.iterdir():
+        if path.is_file() and path.name not in keep and path.name.startswith((f"{bank_name}_", f"{bank_name}.")):
+            path.unlink()
+
+
+def build_all(argv: list[str]) -> None:
+    """Builds all quiz banks listed in a manifest file, in parallel, then reports the status of each bank."""
+    parser = argparse.ArgumentParser(prog=f"{Path(sys.argv[0]).name} build-all")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable more logging.")
+    parser.add_argument(
+        "manifest",
+        type=Path,
+        help="Path to the JSON manifest listing the quiz banks: their names, output directories and input-config pairs.",
+    )
+    parser.add_argument(
+        "--clear-output-dir",
+        action="store_true",
+        help="Deletes the contents of the output directories if they are not empty.",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(), help="Number of quiz banks to build in parallel."
+    )
+    _add_build_arguments(parser)
+    args = parser.parse_args(argv)
+    _check_positive_arguments(parser, args, ["jobs", "preview_page_size", "sample"])
+    _configure_logging(args.verbose)
+
+    try:
+        manifest = ManifestConfig.load_from_json(args.manifest)
+    except Exception as e:
+        _logger.debug("Exception caught when loading manifest", exc_info=True)
+        _logger.error("Failed to load manifest file: %s", traceback.format_exception_only(e)[0].strip())
+        exit(-1)
+
+    # Banks built from the same inputs share the format conversions and the parsed templates
+    cache = BuildCache()
+
+    def build(bank: BankConfig) -> str:
+        start = time.perf_counter()
+        for pair in bank.inputs:
+            if not pair.input.is_file():
+                raise ValueError(f"The specified input file does not exist: '{pair.input}'")
+        configs = [(_load_config(pair.config, args), pair.config) for pair in bank.inputs]
+        previous_index = _load_previous_index(bank.output, bank.name) if args.index else None
+        _prepare_output_dir(bank.output, args.clear_output_dir)
+        packages = execute_logic(
+            list(zip([pair.input for pair in bank.inputs], configs)),
+            bank.output,
+            bank.name,
+            max_items_per_package=bank.max_items_per_package,
+            max_package_bytes=bank.max_package_bytes,
+            previous_index=previous_index,
+            cache=cache,
+            **_build_options(args),
+        )
+        quiz_count = sum(config.count_variants() for config, _ in configs)
+        return f"{quiz_count} quizzes, {len(packages)} package(s), {time.perf_counter() - start:.1f} s"
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(build, bank) for bank in manifest.banks]
+
+    failed = 0
+    _logger.info("Summary:")
+    for bank, future in zip(manifest.banks, futures):
+        try:
+            _logger.info("  OK      %s: %s", bank.name, future.result())
+        except Exception as e:
+            failed += 1
+            _logger.debug("Exception caught when building quiz bank '%s'", bank.name, exc_info=e)
+            _logger.info("  FAILED  %s: %s", bank.name, traceback.format_exception_only(e)[0].strip())
+    _logger.info("%d of %d quiz banks were built successfully.", len(manifest.banks) - failed, len(manifest.banks))
+    if failed > 0:
         exit(-1)
 
-    if args.clear_output_dir and args.output.exists() and args.output.is_dir():
-        shutil.rmtree(args.output)
 
-    if args.output.exists():
-        if not args.output.is_dir():
-            _logger.error("The specified output path is not a directory: '%s'", args.output)
+def publish(argv: list[str]) -> None:
+    """
+    Imports the generated QTI packages into a Canvas course, each as a new question bank, in parallel,
+    then reports the status of each package. The access token is read from an environment variable.
+    """
+    parser = argparse.ArgumentParser(prog=f"{Path(sys.argv[0]).name} publish")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable more logging.")
+    parser.add_argument(
+        "packages",
+        nargs="+",
+        type=Path,
+        help="Paths to the QTI ZIP files or output directories (all packages found in them are imported).",
+    )
+    parser.add_argument("--url", required=True, help="URL of the Canvas instance, e.g. https://canvas.your.domain")
+    parser.add_argument("--course", required=True, help="ID of the course to import the packages into.")
+    parser.add_argument(
+        "--token-env",
+        default="CANVAS_API_TOKEN",
+        help="Name of the environment variable containing the Canvas access token. (Default: CANVAS_API_TOKEN)",
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Number of packages to upload in parallel.")
+    parser.add_argument(
+        "--no-wait", action="store_true", help="Do not wait for Canvas to finish importing the uploaded packages."
+    )
+    parser.add_argument(
+        "--import-timeout",
+        type=int,
+        default=3600,
+        help="Number of seconds to wait for Canvas to import a package before reporting it as failed. (Default: 3600)",
+    )
+    args = parser.parse_args(argv)
+    _check_positive_arguments(parser, args, ["jobs", "import_timeout"])
+    _configure_logging(args.verbose)
+
+    token = os.environ.get(args.token_env)
+    if not token:
+        _logger.error("The Canvas access token must be specified in the %s environment variable.", args.token_env)
+        exit(-1)
+    packages = []
+    for path in args.packages:
+        if path.is_dir():
+            packages.extend(sorted(path.glob("*_export.zip")))
+        elif path.is_file():
+            packages.append(path)
+        else:
+            _logger.error("The specified package does not exist: '%s'", path)
             exit(-1)
-        if any(args.output.iterdir()):
-            _logger.error("The specified output directory is not empty: '%s'", args.output)
+    if not packages:
+        _logger.error("No QTI packages found in the specified directories.")
+        exit(-1)
+
+    client = CanvasClient(args.url, token, import_timeout=args.import_timeout)
+
+    def upload(package: Path) -> str:
+        start = time.perf_counter()
+        state = client.import_package(args.course, package, wait=not args.no_wait)
+        return f"{state}, {package.stat().st_size} bytes, {time.perf_counter() - start:.1f} s"
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            futures = [executor.submit(upload, package) for package in packages]
+    finally:
+        client.close()
+
+    failed = 0
+    _logger.info("Summary:")
+    for package, future in zip(packages, futures):
+        try:
+            _logger.info("  OK      %s: %s", package, future.result())
+        except Exception as e:
+            failed += 1
+            _logger.debug("Exception caught when publishing package '%s'", package, exc_info=e)
+            _logger.info("  FAILED  %s: %s", package, traceback.format_exception_only(e)[0].strip())
+    _logger.info("%d of %d packages were published successfully.", len(packages) - failed, len(packages))
+    if failed > 0:
+        exit(-1)
+
+
+def merge(argv: list[str]) -> None:
+    """Assembles the parts of a quiz bank built via --shard into a single QTI package."""
+    parser = argparse.ArgumentParser(prog=f"{Path(sys.argv[0]).name} merge")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable more logging.")
+    parser.add_argument(
+        "parts",
+        nargs="+",
+        type=Path,
+        help="Paths to the part files or the output directories of the parts (all part files found in them are used).",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        type=Path,
+        help="Path to the empty directory where the QTI package should be placed.",
+    )
+    parser.add_argument(
+        "--clear-output-dir",
+        action="store_true",
+        help="Deletes the contents of the output directory if it is not empty.",
+    )
+    _add_output_arguments(parser)
+    args = parser.parse_args(argv)
+    _check_positive_arguments(parser, args, ["preview_page_size"])
+    _configure_logging(args.verbose)
+
+    part_files = []
+    for path in args.parts:
+        if path.is_dir():
+            part_files.extend(sorted(path.glob("*_part_*_of_*.jsonl.gz")))
+        elif path.is_file():
+            part_files.append(path)
+        else:
+            _logger.error("The specified part does not exist: '%s'", path)
             exit(-1)
-    else:
-        args.output.mkdir(parents=True, exist_ok=True)
 
     try:
-        _logger.debug("Generating quizzes...")
-        execute_logic(list(zip(args.input, configs)), args.output, args.bank_name)
+        _prepare_output_dir(args.output, args.clear_output_dir)
+    except ValueError as e:
+        _logger.error("%s", e)
+        exit(-1)
+
+    start = time.perf_counter()
+    try:
+        package_report = merge_partial_banks(
+            part_files, args.output, args.validate_xml, not args.no_preview, args.preview_page_size
+        )
     except Exception as e:
-        _logger.debug("Exception caught when generating quizzes", exc_info=True)
-        _logger.error("Failed to generate quizzes: %s", traceback.format_exception_only(e)[0].strip())
+        _logger.debug("Exception caught when merging parts", exc_info=True)
+        _logger.error("Failed to merge the parts: %s", traceback.format_exception_only(e)[0].strip())
         exit(-1)
 
+    _logger.info(
+        "A quiz bank containing %d quizzes has been merged from %d parts in the '%s' directory.",
+        package_report.questions,
+        len(part_files),
+        args.output,
+    )
+    if args.report:
+        bank_name = package_report.path.name.removesuffix("_export.zip")
+        build_report = BuildReport(
+            bank_name=bank_name,
+            quizzes=package_report.questions,
+            question_types=package_report.question_types,
+            packages=[package_report],
+            timings={"qti_conversion": package_report.seconds, "total": time.perf_counter() - start},
+        )
+        build_report.save(args.output / _report_file_name(bank_name))
+
+
+def _add_build_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the arguments that affect how the quiz banks are built, shared by all commands."""
+    parser.add_argument(
+        "--sample",
+        type=int,
+        help="Only generate a random sample of at most this many variants of each config."
+        " Only the sampled variants are validated.",
+    )
+    parser.add_argument(
+        "--seed", type=int, help="Seed of the random sampling. The same seed always results in the same sample."
+    )
+    parser.add_argument(
+        "--config-cache",
+        type=Path,
+        help="Directory where validated configs are cached, so that unchanged configs are loaded faster next time."
+        " Only use a directory that no one else can write to.",
+    )
+    _add_output_arguments(parser)
+    parser.add_argument(
+        "--no-markdown-fast-path",
+        action="store_true",
+        help="Always use pandoc to convert markdown, even if the built-in converter supports the input.",
+    )
+    parser.add_argument(
+        "--minify-html",
+        action="store_true",
+        help="Remove the comments and the whitespace that is not rendered from the HTML quiz descriptions,"
+        " which makes the packages smaller. The contents of <pre> blocks are kept as-is.",
+    )
+    parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="Generate byte-identical QTI packages from identical inputs and write their SHA-256 hashes next to them.",
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Write the hashes of the quizzes next to the QTI packages and report the quizzes that were added,"
+        " removed or changed since the previous build.",
+    )
+    parser.add_argument(
+        "--equation-host",
+        help="URL of the Canvas instance rendering the images of $$...$$ equations."
+        " (Default: https://longwood.instructure.com)",
+    )
+
+
+def _add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the arguments that affect which files are written next to the QTI packages, shared by all commands."""
+    parser.add_argument(
+        "--validate-xml",
+        action="store_true",
+        help="Check whether the generated XML files are well-formed. (Slow for large quiz banks.)",
+    )
+    parser.add_argument("--no-preview", action="store_true", help="Do not generate the HTML preview of the quiz bank.")
+    parser.add_argument(
+        "--preview-page-size",
+        type=int,
+        help="Split the HTML preview into multiple pages, each containing at most this many quizzes.",
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="Write a JSON report next to the QTI packages: the number of questions of each type, the images,"
+        " the questions with no correct answer, the missing placeholders and answer fields (unless merging),"
+        " and timings.",
+    )
+
+
+def _load_config(path: Path, args: argparse.Namespace) -> GeneratorConfig:
+    """
+    Loads the config file, or a random sample of its variants if requested via the --sample argument.
+    Unless sampling, the config is loaded from the --config-cache directory if it is cached there.
+    """
+    if args.sample is None:
+        return GeneratorConfig.load_from_json(path, args.config_cache)
+    # Each config gets its own RNG, so that the samples don't depend on the order the configs are loaded in
+    config = GeneratorConfig.load_sample_from_json(path, args.sample, random.Random(args.seed))
+    _logger.debug("Sampled %d variants of configuration file '%s'", config.count_variants(), path)
+    return config
+
+
+def _build_options(args: argparse.Namespace) -> dict[str, Any]:
+    """Converts the arguments added by _add_build_arguments to keyword arguments of execute_logic."""
+    return {
+        "validate_xml": args.validate_xml,
+        "preview": not args.no_preview,
+        "preview_page_size": args.preview_page_size,
+        "markdown_fast_path": not args.no_markdown_fast_path,
+        "minify_html": args.minify_html,
+        "reproducible": args.reproducible,
+        "index": args.index,
+        "report": args.report,
+        "equation_host": args.equation_host,
+    }
+
+
+def _check_positive_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace, names: list[str]) -> None:
+    """Ensures that the specified integer arguments, if present, are positive. Exits with an error otherwise."""
+    for name in names:
+        if getattr(args, name) is not None and getattr(args, name) < 1:
+            parser.error(f"The --{name.replace('_', '-')} argument must be a positive integer.")
+
+
+def _configure_logging(verbose: bool) -> None:
+    logging.basicConfig(
+        force=True,
+        level="DEBUG" if verbose else "INFO",
+        format="%(levelname)s [%(name)s] %(message)s" if verbose else "%(message)s",
+        stream=sys.stdout,
+    )
+
+
+def _load_previous_index(output: Path, bank_name: str) -> BankIndex | None:
+    """Loads the index of the previous build of the quiz bank from the output directory, if there is one."""
+    index_path = output / _index_file_name(bank_name)
+    if not index_path.is_file():
+        _logger.debug("No previous index found at '%s'", index_path)
+        return None
+    return BankIndex.load_from_json(index_path)
+
+
+def _index_file_name(bank_name: str) -> str:
+    return f"{bank_name}_index.json"
+
+
+def _report_file_name(bank_name: str) -> str:
+    return f"{bank_name}_report.json"
+
+
+def _prepare_output_dir(output: Path, clear: bool) -> None:
+    """
+    Ensures that the output directory exists and is empty, optionally clearing it first.
+    Raises ValueError if the directory cannot be used.
+    """
+    if clear and output.exists() and output.is_dir():
+        shutil.rmtree(output)
+
+    if output.exists():
+        if not output.is_dir():
+            raise ValueError(f"The specified output path is not a directory: '{output}'")
+        if any(output.iterdir()):
+            raise ValueError(f"The specified output directory is not empty: '{output}'")
+    else:
+        output.mkdir(parents=True, exist_ok=True)
+
 
 def execute_logic(
-    input_config_pairs: list[tuple[Path, tuple[GeneratorConfig, Path]]], output_dir: Path, bank_name: str
-) -> None:
-    quizzes = []
+    input_config_pairs: list[tuple[Path, tuple[GeneratorConfig, Path]]],
+    output_dir: Path,
+    bank_name: str,
+    max_items_per_package: int | None = None,
+    max_package_bytes: int | None = None,
+    jobs: int = 1,
+    validate_xml: bool = False,
+    preview: bool = True,
+    preview_page_size: int | None = None,
+    markdown_fast_path: bool = True,
+    minify_html: bool = False,
+    reproducible: bool = False,
+    index: bool = False,
+    previous_index: BankIndex | None = None,
+    report: bool = False,
+    cache: BuildCache | None = None,
+    equation_host: str | None = None,
+    render_cache: RenderCache | None = None,
+    memory_profiler: MemoryProfiler | None = None,
+    shard: tuple[int, int] | None = None,
+) -> list[Path]:
+    """
+    Generates the quizzes of the input-config pairs and builds the quiz bank from them.
+    Returns the paths of the created QTI packages.
+    If a shard (i, N) is specified, the variants of all pairs are split into N contiguous ranges, in order,
+    and only the i-th range is generated and converted, into a part file instead of a package.
+    """
+    start = time.perf_counter()
+    # The statistics are always collected, since it's cheap, but they are only written if requested
+    build_report = BuildReport(bank_name=bank_name)
+    bank_index = BankIndex() if index or previous_index is not None else None
+    variant_range = None
+    if shard is not None:
+        total = sum(config.count_variants() for _, (config, _) in input_config_pairs)
+        first_variant, stop_variant = total * (shard[0] - 1) // shard[1], total * shard[0] // shard[1]
+        variant_range = (first_variant, stop_variant)
+    quizzes = _generate_quizzes(
+        input_config_pairs,
+        output_dir,
+        markdown_fast_path,
+        minify_html,
+        cache,
+        build_report,
+        bank_index,
+        render_cache,
+        variant_range,
+    )
+    with contextlib.nullcontext() if memory_profiler is None else memory_profiler.stage("generation and packaging"):
+        if shard is None:
+            packages = quiz_str_list_to_bank(
+                quizzes,
+                output_dir,
+                bank_name,
+                max_items_per_package,
+                max_package_bytes,
+                jobs,
+                validate_xml,
+                preview,
+                preview_page_size,
+                reproducible,
+                build_report.packages,
+                equation_host,
+                memory_profiler,
+            )
+        else:
+            packages = [
+                quiz_str_list_to_partial_bank(
+                    quizzes,
+                    output_dir,
+                    bank_name,
+                    shard[0],
+                    shard[1],
+                    first_variant + 1,
+                    stop_variant - first_variant,
+                    jobs,
+                    preview,
+                    reproducible,
+                    build_report.packages,
+                    equation_host,
+                )
+            ]
+
+    quiz_count = build_report.quizzes = sum(input_report.quizzes for input_report in build_report.inputs)
+    _report_diagnostics(build_report)
+    if minify_html:
+        build_report.minified_bytes = sum(
+            input_report.minified_bytes * input_report.quizzes for input_report in build_report.inputs
+        )
+        _logger.info(
+            "HTML minification removed %d bytes from the quizzes (before compression), the packages take %d bytes.",
+            build_report.minified_bytes,
+            sum(package_report.bytes for package_report in build_report.packages),
+        )
+    if shard is not None:
+        _logger.info(
+            "Part %d of %d of the quiz bank, containing %d of its %d quizzes, has been created in the '%s' directory.",
+            shard[0],
+            shard[1],
+            quiz_count,
+            total,
+            output_dir,
+        )
+    elif len(packages) == 1:
+        _logger.info("A quiz bank containing %d quizzes has been created in the '%s' directory.", quiz_count, output_dir)
+    else:
+        _logger.info(
+            "A quiz bank containing %d quizzes has been created in the '%s' directory, split into %d packages.",
+            quiz_count,
+            output_dir,
+            len(packages),
+        )
+
+    if bank_index is not None:
+        bank_index.save(output_dir / _index_file_name(bank_name))
+        if previous_index is not None:
+            build_report.changes = bank_index.compare(previous_index)
+            _report_changes(build_report.changes)
+
+    for package_report in build_report.packages:
+        for question_type, count in package_report.question_types.items():
+            build_report.question_types[question_type] = build_report.question_types.get(question_type, 0) + count
+    build_report.timings["qti_conversion"] = sum(package_report.seconds for package_report in build_report.packages)
+    build_report.timings["total"] = time.perf_counter() - start
+    if memory_profiler is not None:
+        build_report.memory = list(memory_profiler.stages)
+        memory_profiler.log()
+    if report:
+        build_report.save(output_dir / _report_file_name(bank_name))
+    return packages
+
+
+def _report_diagnostics(report: BuildReport) -> None:
+    """
+    Collects the problems of the inputs into the report, deduplicated per input and key,
+    then logs each of them once, with the number of quizzes affected.
+    """
+    for input_report in report.inputs:
+        input, count = input_report.input, input_report.quizzes
+        for placeholder in input_report.missing_placeholders:
+            report.add_diagnostic("warning", "missing_placeholder", input, placeholder, count)
+        for answer_field in input_report.missing_answer_fields:
+            report.add_diagnostic("error", "missing_answer_field", input, answer_field, count)
+    for diagnostic in report.diagnostics:
+        if diagnostic.code == "missing_placeholder":
+            _logger.warning(
+                "Placeholder '%s' not found in quiz description '%s' (%d quizzes affected).",
+                diagnostic.key,
+                diagnostic.input.name,
+                diagnostic.count,
+            )
+        else:
+            _logger.error(
+                "Answer field '[%s]' not found in quiz description '%s' (%d quizzes affected)."
+                " The student will have no way to enter the answer.",
+                diagnostic.key,
+                diagnostic.input.name,
+                diagnostic.count,
+            )
+
+
+def _report_changes(changes: IndexChanges) -> None:
+    _logger.info(
+        "Compared to the previous build: %d added, %d removed, %d changed and %d unchanged quizzes.",
+        len(changes.added),
+        len(changes.removed),
+        len(changes.changed),
+        changes.unchanged,
+    )
+    for status, keys in (("ADDED", changes.added), ("REMOVED", changes.removed), ("CHANGED", changes.changed)):
+        for key in keys:
+            _logger.info("  %-8s%s", status, key)
+
+
+def _generate_quizzes(
+    input_config_pairs: list[tuple[Path, tuple[GeneratorConfig, Path]]],
+    output_dir: Path,
+    markdown_fast_path: bool,
+    minify_html: bool,
+    cache: BuildCache | None,
+    report: BuildReport,
+    index: BankIndex | None = None,
+    render_cache: RenderCache | None = None,
+    variant_range: tuple[int, int] | None = None,
+) -> Iterator[QuizParts]:
+    """
+    Lazily generates the text-format quizzes of all input-config pairs, so that they never have to be all in memory.
+    The statistics of the inputs and the timings of the stages are recorded in the report.
+    If an index is specified, the generated quizzes are added to it.
+    If a render cache is specified, the conversions and quizzes of unchanged pairs are taken from it instead.
+    If a range is specified, only the variants within it (counted across all pairs, in order) are generated,
+    and the pairs without such variants are skipped.
+    """
+    timings = report.timings
+    timings["format_conversion"] = timings["generation"] = 0
+    offset = 0
     for input, config in input_config_pairs:
+        start_variant, stop_variant = 0, None
+        if variant_range is not None:
+            count = config[0].count_variants()
+            start_variant, stop_variant = max(variant_range[0] - offset, 0), min(variant_range[1] - offset, count)
+            offset += count
+            if start_variant >= stop_variant:
+                continue
         input_name, config_name = input.name, config[1].name
+        input_report = InputReport(input=input, config=config[1])
+        report.inputs.append(input_report)
 
         _logger.debug("Processing input '%s' with configuration '%s'...", input_name, config_name)
-        intermediate_file = execute_format_conversion(input, output_dir)
-        for variant_num, variant in enumerate(config[0].variants, start=1):
-            _logger.debug("Processing variant #%d: %s", variant_num, variant)
-            quizzes.append(generate_variant(variant, intermediate_file))
+        start = time.perf_counter()
+        if render_cache is not None:
+            quizzes = render_cache.quizzes(
+                input, config[0], config[1], output_dir, markdown_fast_path, minify_html, input_report
+            )
+        else:
+            if cache is None:
+                intermediate_file = execute_format_conversion(
+                    input, output_dir, markdown_fast_path, minify_html, input_report
+                )
+            else:
+                intermediate_file = cache.convert(input, output_dir, markdown_fast_path, minify_html, input_report)
+            variants = config[0].iter_variants(start_variant, stop_variant)
+            quizzes = generate_variants(variants, intermediate_file, cache, input_report)
+        timings["format_conversion"] += time.perf_counter() - start
+        for variant_num, quiz in enumerate(_timed(quizzes, timings, "generation"), start=start_variant + 1):
+            if index is not None:
+                index.add(input, config[1], variant_num, quiz)
+            yield quiz
 
         _logger.info(
             "Processed %s - %s pair and generated %d quizzes.",
             input_name,
             config_name,
-            len(config[0].variants),
+            input_report.quizzes,
         )
 
-    quiz_str_list_to_bank(quizzes, output_dir, bank_name)
-    _logger.info("A quiz bank containing %d quizzes has been created in the '%s' directory.", len(quizzes), output_dir)
+
+def _timed(items: Iterable[_T], timings: dict[str, float], stage: str) -> Iterator[_T]:
+    """Yields the items, adding the time spent producing them (but not consuming them) to the timing of the stage."""
+    iterator = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            timings[stage] += time.perf_counter() - start
+        yield item
 
 
 if __name__ == "__main__":
@@ -1,16 +1,109 @@
+from collections.abc import Iterable, Iterator, Sequence
+import hashlib
+import itertools
+import json
+import keyword
+import logging
+import marshal
+import math
+import os
 from pathlib import Path
+import random
+import re
+import string
+import tempfile
+from typing import Any, Literal, TypeVar, overload
 
-from pydantic import BaseModel, field_validator, model_validator
+from pydantic import (
+    BaseModel,
+    PositiveInt,
+    PrivateAttr,
+    ValidationInfo,
+    field_serializer,
+    field_validator,
+    model_validator,
+)
+
+from canvas_quiz_generator.expressions import FUNCTIONS, Template
+
+
+_logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+BANK_NAME_PATTERN = re.compile(r"^[a-zA-Z0-9\._-]+$")
+"""The valid quiz bank names: they are also used as file names."""
+
+DROPDOWN_NAME_PATTERN = re.compile(r"\w+")
+"""The valid names of the dropdowns of MD questions: the converter only recognizes these within brackets."""
+
+CONFIG_CACHE_VERSION = 2
+"""The version of the config cache format. Must be incremented whenever the config models change."""
+
+QuestionType = Literal["MB", "MD", "MC", "MA", "SA", "NU"]
+"""
+The supported question types: fill in multiple blanks, multiple dropdowns, multiple choice, multiple answers,
+short answer (fill in the blank) and numerical questions.
+"""
+
+
+class ChoiceConfig(BaseModel):
+    """Represents an option of a multiple choice or multiple answers question."""
+
+    text: str
+    """The text of the option."""
+
+    correct: bool = False
+    """Whether selecting this option is (part of) the correct answer."""
+
+    @field_validator("text")
+    def validate_text(cls, v):
+        """Ensures that the text is not empty and does not contain unsupported characters such as newlines."""
+        if not v.strip() or any(c in v for c in ("\r", "\n")):
+            raise ValueError(f"Choice text '{v!r}' is empty or contains invalid character(s).")
+        return v
+
+
+class NumericalAnswerConfig(BaseModel):
+    """Represents an accepted answer of a numerical question."""
+
+    value: float
+    """The exact answer."""
+
+    margin: float = 0
+    """Answers in the [value - margin, value + margin] range are also accepted."""
+
+    @field_validator("margin")
+    def validate_margin(cls, v):
+        """Ensures that the margin is not negative."""
+        if v < 0:
+            raise ValueError(f"Margin '{v}' must not be negative.")
+        return v
 
 
 class VariantConfig(BaseModel):
-    """Represents one quiz variant with placeholders and answer fields."""
+    """Represents one quiz variant with placeholders and answers."""
+
+    question_type: QuestionType = "MB"
+    """The type of the generated question, fill in multiple blanks by default."""
 
     placeholders: dict[str, str]
     """Maps the strings that should be replaced to the values they should be replaced with."""
 
-    answer_fields: dict[str, str]
-    """Maps the question identifiers to the correct answers."""
+    answer_fields: dict[str, str] = {}
+    """MB and MD questions: maps the question identifiers (blanks or dropdowns) to the correct answers."""
+
+    distractors: dict[str, list[str]] = {}
+    """MD questions: maps the dropdown identifiers to the incorrect options."""
+
+    choices: list[ChoiceConfig] = []
+    """MC and MA questions: the options the student can choose from."""
+
+    answers: list[str] = []
+    """SA questions: the accepted answers."""
+
+    numerical_answers: list[NumericalAnswerConfig] = []
+    """NU questions: the accepted answers."""
 
     @field_validator("answer_fields")
     def validate_answer_fields(cls, v):
@@ -22,19 +115,209 @@ class VariantConfig(BaseModel):
                 raise ValueError(f"Value '{value!r}' in 'answer_fields' contains invalid character(s).")
         return v
 
+    @field_validator("answer_fields")
+    def validate_dropdown_names(cls, v, info: ValidationInfo):
+        """Ensures that the dropdowns of MD questions can be found: their names may only contain word characters."""
+        if info.data.get("question_type") == "MD":
+            for key in v:
+                if not DROPDOWN_NAME_PATTERN.fullmatch(key):
+                    raise ValueError(
+                        f"Key {key!r} in 'answer_fields' is not a valid dropdown name for 'MD' questions:"
+                        " only letters, digits and underscores are allowed."
+                    )
+        return v
+
+    @field_validator("distractors")
+    def validate_distractors(cls, v):
+        """Ensures that the options are not empty and do not contain unsupported characters such as newlines."""
+        for key, values in v.items():
+            for value in values:
+                if not value.strip() or any(c in value for c in ("\r", "\n")):
+                    raise ValueError(f"Value '{value!r}' in 'distractors' is empty or contains invalid character(s).")
+        return v
+
+    @field_validator("answers")
+    def validate_answers(cls, v):
+        """Ensures that the answers are not empty and do not contain unsupported characters such as newlines."""
+        for value in v:
+            if not value.strip() or any(c in value for c in ("\r", "\n")):
+                raise ValueError(f"Value '{value!r}' in 'answers' is empty or contains invalid character(s).")
+        return v
+
+    @model_validator(mode="after")
+    def _validate_question_type(self) -> "VariantConfig":
+        """Ensure the answers required by the question type are specified."""
+        if self.question_type in ("MB", "MD") and not self.answer_fields:
+            raise ValueError(f"'{self.question_type}' questions must have at least one 'answer_fields' entry.")
+        if self.question_type == "MD" and not self.distractors.keys() <= self.answer_fields.keys():
+            raise ValueError("All 'distractors' keys must also be present in 'answer_fields'.")
+        if self.question_type in ("MC", "MA"):
+            correct_count = sum(choice.correct for choice in self.choices)
+            if len(self.choices) > len(string.ascii_letters):
+                raise ValueError(f"At most {len(string.ascii_letters)} 'choices' are supported.")
+            if correct_count == 0 or (self.question_type == "MC" and correct_count > 1):
+                raise ValueError(
+                    f"'{self.question_type}' questions must have {'exactly' if self.question_type == 'MC' else 'at least'}"
+                    f" one correct choice, but found {correct_count}."
+                )
+        if self.question_type == "SA" and not self.answers:
+            raise ValueError("'SA' questions must have at least one 'answers' entry.")
+        if self.question_type == "NU" and not self.numerical_answers:
+            raise ValueError("'NU' questions must have at least one 'numerical_answers' entry.")
+        return self
+
+
+class RangeConfig(BaseModel):
+    """Represents the values of a parameter as an arithmetic sequence. Like in Python's range, stop is excluded."""
+
+    start: int | float = 0
+    """The first value."""
+
+    stop: int | float
+    """The sequence ends before reaching this value."""
+
+    step: int | float = 1
+    """The difference between consecutive values."""
+
+    @field_validator("step")
+    def validate_step(cls, v):
+        """Ensures that the sequence progresses."""
+        if v == 0:
+            raise ValueError("Step must not be zero.")
+        return v
+
+    def values(self) -> list[int | float]:
+        """Lists the values of the sequence. Floating-point values are rounded to hide representation errors."""
+        count = max(0, math.ceil((self.stop - self.start) / self.step))
+        values = (self.start + i * self.step for i in range(count))
+        values = (value if isinstance(value, int) else round(value, 12) for value in values)
+        # Representation errors may make the count too large by one, the stop value must still be excluded
+        return [value for value in values if (value < self.stop if self.step > 0 else value > self.stop)]
+
+
+class GeneratorSpecConfig(BaseModel):
+    """
+    Describes the variants as the cartesian product of the values of some parameters,
+    instead of listing the variants one by one. The variants are only created when they are needed.
+    """
+
+    parameters: dict[str, list[Any] | RangeConfig]
+    """
+    Maps the names of the parameters to their values: a list or a range. The variants are generated for
+    each combination of the values, the first parameter changing the slowest.
+    """
+
+    variant: dict[str, Any]
+    """
+    A variant config, whose strings (except for the question type and the dictionary keys) are templates:
+    expressions enclosed in braces are replaced with their values, e.g. "{A + B}" or "{price * 1.27:.2f}".
+    Literal braces must be doubled.
+    """
+
+    _template: Any = PrivateAttr(None)
+
+    @field_validator("parameters")
+    def validate_parameters(cls, v):
+        """Ensures that the parameter names can be used within expressions."""
+        for name in v:
+            if not name.isidentifier() or keyword.iskeyword(name) or name in FUNCTIONS:
+                raise ValueError(f"Parameter name '{name}' must be a valid identifier, not a keyword or function name.")
+        return v
+
+    @model_validator(mode="after")
+    def _compile_template(self) -> "GeneratorSpecConfig":
+        """Parse the templates once, then ensure that the first variant is valid."""
+
+        def parse(value: Any) -> Any:
+            if isinstance(value, str):
+                return Template(value, self.parameters.keys())
+            if isinstance(value, dict):
+                return {key: parse(item) for key, item in value.items()}
+            if isinstance(value, list):
+                return [parse(item) for item in value]
+            return value
+
+        self._template = {
+            key: value if key == "question_type" else parse(value) for key, value in self.variant.items()
+        }
+        next(self.expand(), None)
+        return self
+
+    def count(self) -> int:
+        """Counts the variants without creating them."""
+        return math.prod(len(values) for values in self._parameter_values())
+
+    def expand(self, start: int = 0, stop: int | None = None) -> Iterator[VariantConfig]:
+        """Lazily creates and validates the variants, optionally only a range of them (the others are not created)."""
+        for combination in itertools.islice(itertools.product(*self._parameter_values()), start, stop):
+            yield self._create(combination)
+
+    def sample(self, sample_size: int, rng: random.Random) -> list[VariantConfig]:
+        """
+        Creates a random sample of the variants (all of them, if there are not more than the sample size),
+        in the order they would be created by expand. Only the sampled variants are created.
+        """
+        parameter_values = self._parameter_values()
+        indices = sorted(rng.sample(range(self.count()), min(sample_size, self.count())))
+        variants = []
+        for index in indices:
+            # The index in the cartesian product, the last parameter changing the fastest
+            combination = []
+            for values in reversed(parameter_values):
+                index, value_index = divmod(index, len(values))
+                combination.append(values[value_index])
+            variants.append(self._create(combination[::-1]))
+        return variants
+
+    def _create(self, combination: Iterable[Any]) -> VariantConfig:
+        """Creates and validates the variant with the specified parameter values."""
+
+        def render(value: Any, values: dict[str, Any]) -> Any:
+            if isinstance(value, Template):
+                return value.render(values)
+            if isinstance(value, dict):
+                return {key: render(item, values) for key, item in value.items()}
+            if isinstance(value, list):
+                return [render(item, values) for item in value]
+            return value
+
+        values = dict(zip(self.parameters.keys(), combination))
+        try:
+            return VariantConfig.model_validate(render(self._template, values))
+        except ValueError as e:
+            raise ValueError(f"Failed to generate the variant with parameters {values}: {e}") from e
+
+    def _parameter_values(self) -> list[list[Any]]:
+        return [values.values() if isinstance(values, RangeConfig) else values for values in self.parameters.values()]
+
 
 class GeneratorConfig(BaseModel):
-    """Top-level config model holding all variants."""
+    """Top-level config model holding all variants, or the spec they are generated from."""
 
-    variants: list[VariantConfig]
+    variants: list[VariantConfig] = []
     """The different variants that should be generated."""
 
+    generator: GeneratorSpecConfig | None = None
+    """Generates the variants from parameters, instead of listing them in 'variants'."""
+
+    _columns: dict[str, Any] | None = PrivateAttr(None)
+    """The already validated variants in columnar form, if the config was loaded from the cache."""
+
     @model_validator(mode="after")
     def _validate_consistency(self) -> "GeneratorConfig":
-        """Ensure every variant has the same placeholders and answer fields."""
+        """
+        Ensure that the variants are either listed or generated,
+        and that every variant has the same question type, placeholders and answer fields.
+        """
+        if ("variants" in self.model_fields_set) == (self.generator is not None):
+            raise ValueError("Exactly one of 'variants' and 'generator' must be specified.")
         if len(self.variants) <= 1:
             return self
 
+        question_types = {variant.question_type for variant in self.variants}
+        if len(question_types) > 1:
+            raise ValueError(f"All variants must have the same 'question_type', but found: {sorted(question_types)}")
+
         for field in ["placeholders", "answer_fields"]:
             first_value = getattr(self.variants[0], field).keys()
             for variant in self.variants[1:]:
@@ -46,8 +329,306 @@ class GeneratorConfig(BaseModel):
                     )
         return self
 
+    @field_serializer("variants")
+    def _serialize_variants(self, variants: Sequence[VariantConfig]) -> list[VariantConfig]:
+        """The variants of a config loaded from the cache are only created from its columns when accessed."""
+        return list(variants)
+
+    def count_variants(self) -> int:
+        """Counts the variants, without creating the generated ones."""
+        if self._columns is not None:
+            return self._columns["count"]
+        return len(self.variants) if self.generator is None else self.generator.count()
+
+    def iter_variants(self, start: int = 0, stop: int | None = None) -> Iterator[VariantConfig]:
+        """
+        Iterates over the listed variants, or lazily creates the generated ones.
+        The variants of a config loaded from the cache are also created lazily, from their columns.
+        If a range is specified, only the variants within it are iterated over (and created).
+        """
+        if self._columns is not None:
+            return _iter_columns(self._columns, start, stop)
+        if self.generator is not None:
+            return self.generator.expand(start, stop)
+        return itertools.islice(self.variants, start, stop)
+
     @staticmethod
-    def load_from_json(path: Path) -> "GeneratorConfig":
-        """Load and parse config JSON file found at the specified path."""
+    def load_from_json(path: Path, cache_dir: Path | None = None) -> "GeneratorConfig":
+        """
+        Load and parse config JSON file found at the specified path.
+        If a cache directory is specified, the validated variants are cached there in a binary, columnar form,
+        keyed by the hash of the file and the cache version. If the file didn't change since it was cached,
+        the variants are loaded from the cache without being parsed and validated again,
+        and they are only created when they are iterated. Configs using a generator are not cached.
+        """
+        if cache_dir is None:
+            return GeneratorConfig.model_validate_json(path.read_text())
+
+        json_bytes = path.read_bytes()
+        cache_path = cache_dir / f"{hashlib.sha256(json_bytes).hexdigest()}-v{CONFIG_CACHE_VERSION}.bin"
+        try:
+            return _config_from_columns(marshal.loads(cache_path.read_bytes()))
+        except (OSError, ValueError, EOFError, TypeError, KeyError):  # Missing, outdated or damaged cache entry
+            pass
+        config = GeneratorConfig.model_validate_json(json_bytes)
+        if config.generator is not None:
+            return config
+        # The file is replaced atomically, since other builds might be reading it at the same time.
+        # The temporary file is unique, since other threads of the same process might be writing the same entry.
+        data, temp_path = marshal.dumps(_config_to_columns(config)), None
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(suffix=".tmp", prefix=f".{cache_path.name}.", dir=cache_dir)
+            temp_path = Path(temp_name)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, cache_path)
+        except OSError as e:  # The config is still usable, it will be cached next time
+            _logger.warning("Failed to cache configuration file '%s': %s", path, e)
+            if temp_path is not None:
+                temp_path.unlink(missing_ok=True)
+        return config
+
+    @staticmethod
+    def load_sample_from_json(path: Path, sample_size: int, rng: random.Random) -> "GeneratorConfig":
+        """
+        Load a random sample of the variants of the config JSON file found at the specified path.
+        The listed variants are parsed one by one and reservoir sampled, so only the sampled variants are kept
+        and validated. The sampled variants keep their order. The result only depends on the state of the RNG.
+        """
         json_string = path.read_text()
-        return GeneratorConfig.model_validate_json(json_string)
+        data: dict[str, Any] = {}
+        sampled = _reservoir_sample(_iter_json_array(json_string, "variants", data), sample_size, rng)
+        if "variants" in data:
+            data["variants"] = [variant for _, variant in sorted(sampled, key=lambda item: item[0])]
+        config = GeneratorConfig.model_validate(data)
+        if config.generator is None:
+            return config
+        return GeneratorConfig(variants=config.generator.sample(sample_size, rng))
+
+
+def _config_to_columns(config: GeneratorConfig) -> dict[str, Any]:
+    """
+    Converts the listed variants of the config to columns of built-in values, which can be serialized by marshal.
+    The keys of the placeholders and answer fields are shared by all variants, so they are only stored once.
+    The other fields are only stored if a variant uses them.
+    """
+    variants = config.variants
+    columns: dict[str, Any] = {
+        "version": CONFIG_CACHE_VERSION,
+        "count": len(variants),
+        "question_type": variants[0].question_type if variants else "MB",
+    }
+    for field in ["placeholders", "answer_fields"]:
+        keys = list(getattr(variants[0], field)) if variants else []
+        columns[field] = {key: [getattr(variant, field)[key] for variant in variants] for key in keys}
+    if any(variant.distractors for variant in variants):
+        columns["distractors"] = [variant.distractors for variant in variants]
+    if any(variant.choices for variant in variants):
+        columns["choices"] = [[(choice.text, choice.correct) for choice in variant.choices] for variant in variants]
+    if any(variant.answers for variant in variants):
+        columns["answers"] = [variant.answers for variant in variants]
+    if any(variant.numerical_answers for variant in variants):
+        columns["numerical_answers"] = [
+            [(answer.value, answer.margin) for answer in variant.numerical_answers] for variant in variants
+        ]
+    return columns
+
+
+def _config_from_columns(columns: dict[str, Any]) -> GeneratorConfig:
+    """
+    Restores a config converted by _config_to_columns, without validating it again.
+    Raises ValueError if the columns were written by another version of the cache format.
+    """
+    if columns["version"] != CONFIG_CACHE_VERSION:
+        raise ValueError(f"Unsupported config cache version: {columns['version']}")
+    config = GeneratorConfig.model_construct(variants=_ColumnVariants(columns))
+    config._columns = columns
+    return config
+
+
+class _ColumnVariants(Sequence[VariantConfig]):
+    """
+    The 'variants' of a config loaded from the cache: the variants are only created from the columns when accessed,
+    so the field agrees with count_variants and iter_variants, like when the config is loaded from the JSON file.
+    """
+
+    def __init__(self, columns: dict[str, Any]) -> None:
+        self._columns = columns
+
+    def __len__(self) -> int:
+        return self._columns["count"]
+
+    def __iter__(self) -> Iterator[VariantConfig]:
+        return _iter_columns(self._columns)
+
+    @overload
+    def __getitem__(self, index: int) -> VariantConfig: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[VariantConfig]: ...
+
+    def __getitem__(self, index: int | slice) -> VariantConfig | list[VariantConfig]:
+        if isinstance(index, slice):
+            return list(self)[index]
+        if not -len(self) <= index < len(self):
+            raise IndexError("variant index out of range")
+        index %= len(self)
+        return next(_iter_columns(self._columns, index, index + 1))
+
+
+def _iter_columns(columns: dict[str, Any], start: int = 0, stop: int | None = None) -> Iterator[VariantConfig]:
+    """Creates the variants stored in the columns (optionally only a range of them), without validating them again."""
+    count, question_type = columns["count"], columns["question_type"]
+    placeholders = _rows(columns["placeholders"], count)
+    answer_fields = _rows(columns["answer_fields"], count)
+    distractors = columns.get("distractors") or itertools.repeat({}, count)
+    choices = columns.get("choices") or itertools.repeat([], count)
+    answers = columns.get("answers") or itertools.repeat([], count)
+    numerical_answers = columns.get("numerical_answers") or itertools.repeat([], count)
+    rows = zip(placeholders, answer_fields, distractors, choices, answers, numerical_answers)
+    for row in itertools.islice(rows, start, stop):
+        yield VariantConfig.model_construct(
+            question_type=question_type,
+            placeholders=row[0],
+            answer_fields=row[1],
+            distractors=dict(row[2]),
+            choices=[ChoiceConfig.model_construct(text=text, correct=correct) for text, correct in row[3]],
+            answers=list(row[4]),
+            numerical_answers=[
+                NumericalAnswerConfig.model_construct(value=value, margin=margin) for value, margin in row[5]
+            ],
+        )
+
+
+def _rows(columns: dict[str, list[str]], count: int) -> Iterator[dict[str, str]]:
+    """Lazily converts the columns of a dictionary field back to one dictionary per variant."""
+    if not columns:
+        return ({} for _ in range(count))
+    return (dict(zip(columns, row)) for row in zip(*columns.values()))
+
+
+def _reservoir_sample(items: Iterable[_T], sample_size: int, rng: random.Random) -> list[tuple[int, _T]]:
+    """Chooses a uniformly random sample of the items in a single pass. Returns the chosen items and their indices."""
+    reservoir: list[tuple[int, _T]] = []
+    for index, item in enumerate(items):
+        if index < sample_size:
+            reservoir.append((index, item))
+        else:
+            replaced = rng.randrange(index + 1)
+            if replaced < sample_size:
+                reservoir[replaced] = (index, item)
+    return reservoir
+
+
+def _iter_json_array(json_string: str, key: str, rest: dict[str, Any]) -> Iterator[Any]:
+    """
+    Incrementally parses the array found at the specified key of the top-level JSON object, yielding its items.
+    The other values of the object are stored in the specified dictionary,
+    as is the key of the array (with an empty list), if present. Raises ValueError if the JSON is not valid.
+    """
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r"[ \t\n\r]*")
+
+    def skip(position: int) -> int:
+        return whitespace.match(json_string, position).end()  # type: ignore[union-attr]
+
+    def expect(position: int, token: str) -> int:
+        position = skip(position)
+        if not json_string.startswith(token, position):
+            raise ValueError(f"Invalid JSON: expected '{token}' at position {position}")
+        return position + 1
+
+    position = skip(expect(0, "{"))
+    closed = json_string.startswith("}", position)
+    while not closed:
+        name, position = decoder.raw_decode(json_string, skip(position))
+        if not isinstance(name, str):
+            raise ValueError(f"Invalid JSON: expected a string key at position {position}")
+        position = skip(expect(position, ":"))
+        if name == key and json_string.startswith("[", position):
+            rest[name] = []
+            position = skip(position + 1)
+            array_closed = json_string.startswith("]", position)
+            while not array_closed:
+                item, position = decoder.raw_decode(json_string, skip(position))
+                yield item
+                position = skip(position)
+                array_closed = json_string.startswith("]", position)
+                if not array_closed:
+                    position = expect(position, ",")
+            position += 1
+        else:
+            rest[name], position = decoder.raw_decode(json_string, position)
+        position = skip(position)
+        closed = json_string.startswith("}", position)
+        if not closed:
+            position = expect(position, ",")
+    if skip(position + 1) != len(json_string):
+        raise ValueError(f"Invalid JSON: unexpected data at position {skip(position + 1)}")
+
+
+class BankInputConfig(BaseModel):
+    """Represents a quiz description and its configuration file within a build manifest."""
+
+    input: Path
+    """Path to the quiz description."""
+
+    config: Path
+    """Path to the JSON configuration file."""
+
+
+class BankConfig(BaseModel):
+    """Represents a quiz bank to build, as listed in a build manifest."""
+
+    name: str = "quiz_bank"
+    """Question bank name to use in Canvas and for the generated files."""
+
+    output: Path
+    """Path to the directory where the generated files should be placed."""
+
+    inputs: list[BankInputConfig]
+    """The quiz descriptions and configurations to include in the bank."""
+
+    max_items_per_package: PositiveInt | None = None
+    """Split the quiz bank into multiple QTI packages, each containing at most this many quizzes."""
+
+    max_package_bytes: PositiveInt | None = None
+    """Split the quiz bank into multiple QTI packages, each containing approximately at most this many bytes."""
+
+    @field_validator("name")
+    def validate_name(cls, v):
+        """Ensures that the name can be used as a file name."""
+        if not BANK_NAME_PATTERN.match(v):
+            raise ValueError(f"Bank name '{v}' is not valid. Please don't use special characters.")
+        return v
+
+
+class ManifestConfig(BaseModel):
+    """Top-level build manifest model listing the quiz banks to build."""
+
+    banks: list[BankConfig]
+    """The quiz banks that should be built."""
+
+    @model_validator(mode="after")
+    def _validate_outputs(self) -> "ManifestConfig":
+        """Ensure the banks don't share output directories, which would make them overwrite each other."""
+        outputs = [bank.output for bank in self.banks]
+        duplicates = {str(output) for output in outputs if outputs.count(output) > 1}
+        if duplicates:
+            raise ValueError(f"Multiple banks have the same output directory: {sorted(duplicates)}")
+        return self
+
+    @staticmethod
+    def load_from_json(path: Path) -> "ManifestConfig":
+        """
+        Load and parse manifest JSON file found at the specified path.
+        Relative paths within the manifest are relative to the manifest's directory.
+        """
+        manifest = ManifestConfig.model_validate_json(path.read_text())
+        for bank in manifest.banks:
+            bank.output = path.parent / bank.output
+            for pair in bank.inputs:
+                pair.input = path.parent / pair.input
+                pair.config = path.parent / pair.config
+        return manifest
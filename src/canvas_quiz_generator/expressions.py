@@ -0,0 +1,164 @@
+"""
+Expressions and string templates of variant generator specs. Expressions are limited to arithmetic, comparisons,
+boolean operators, conditional expressions and calls of a few built-in functions, all applied to the parameters
+of the variant, so that configuration files cannot execute arbitrary code. The operators that could create huge
+values (**, << and the repetition of strings) are bounded, so that they cannot exhaust the memory either.
+"""
+
+import ast
+from collections.abc import Callable, Collection, Mapping
+import math
+import re
+from typing import Any
+
+
+FUNCTIONS: dict[str, Callable[..., Any]] = {
+    "abs": abs,
+    "ceil": math.ceil,
+    "float": float,
+    "floor": math.floor,
+    "int": int,
+    "len": len,
+    "max": max,
+    "min": min,
+    "round": round,
+    "sqrt": math.sqrt,
+    "str": str,
+}
+"""The functions that can be called within expressions."""
+
+_ALLOWED_NODES = (
+    ast.Expression,
+    ast.Constant,
+    ast.Name,
+    ast.Load,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.BoolOp,
+    ast.Compare,
+    ast.IfExp,
+    ast.Call,
+    ast.operator,
+    ast.unaryop,
+    ast.boolop,
+    ast.cmpop,
+)
+"""The syntax elements expressions may consist of."""
+
+_MAX_INTEGER_BITS = 4096
+"""The size of the largest integers ** and << may create, so that an expression cannot exhaust the memory."""
+
+_MAX_REPEAT_LENGTH = 1 << 20
+"""The length of the longest strings and lists * may create by repeating one."""
+
+
+def _power(base: Any, exponent: Any) -> Any:
+    if (
+        isinstance(base, int)
+        and isinstance(exponent, int)
+        and exponent * (abs(base).bit_length() - 1) > _MAX_INTEGER_BITS
+    ):
+        raise ValueError(f"The result of {base} ** {exponent} would be too large")
+    return base**exponent
+
+
+def _left_shift(value: Any, shift: Any) -> Any:
+    if isinstance(value, int) and isinstance(shift, int) and value.bit_length() + shift > _MAX_INTEGER_BITS:
+        raise ValueError(f"The result of {value} << {shift} would be too large")
+    return value << shift
+
+
+def _multiply(left: Any, right: Any) -> Any:
+    for sequence, count in ((left, right), (right, left)):
+        if isinstance(sequence, str | list | tuple) and isinstance(count, int):
+            if len(sequence) * count > _MAX_REPEAT_LENGTH:
+                raise ValueError(f"The result of repeating a sequence {count} times would be too long")
+    return left * right
+
+
+_BOUNDED_OPERATORS: dict[type[ast.operator], tuple[str, Callable[[Any, Any], Any]]] = {
+    ast.Pow: ("<pow>", _power),
+    ast.LShift: ("<lshift>", _left_shift),
+    ast.Mult: ("<mult>", _multiply),
+}
+"""
+The operators that could create huge values, and the names and functions they are replaced with before compilation.
+The names are not identifiers, so they cannot collide with the parameters.
+"""
+
+
+class _BoundOperators(ast.NodeTransformer):
+    """Replaces the operators of _BOUNDED_OPERATORS with calls of their bounded versions."""
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        if type(node.op) not in _BOUNDED_OPERATORS:
+            return node
+        name = ast.Name(id=_BOUNDED_OPERATORS[type(node.op)][0], ctx=ast.Load())
+        return ast.copy_location(ast.Call(func=name, args=[node.left, node.right], keywords=[]), node)
+
+_TEMPLATE_TOKEN = re.compile(r"\{\{|\}\}|\{([^{}]*)\}|[{}]")
+"""Matches the escaped braces, the expressions (with an optional format spec) and the unmatched braces of templates."""
+
+
+_GLOBALS = {"__builtins__": {}, **FUNCTIONS, **dict(_BOUNDED_OPERATORS.values())}
+"""The global names available to the compiled expressions."""
+
+
+class Expression:
+    """A validated and compiled expression, which may refer to the specified parameters and to FUNCTIONS."""
+
+    def __init__(self, source: str, names: Collection[str]) -> None:
+        self.source = source.strip()
+        try:
+            tree = ast.parse(self.source, mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Expression '{self.source}' is not valid: {e.msg}") from None
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise ValueError(f"Expression '{self.source}' contains unsupported syntax: {type(node).__name__}")
+            if isinstance(node, ast.Name) and node.id not in names and node.id not in FUNCTIONS:
+                raise ValueError(f"Expression '{self.source}' refers to unknown parameter '{node.id}'")
+            if isinstance(node, ast.Call) and (
+                not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords
+            ):
+                raise ValueError(f"Expression '{self.source}' may only call functions {sorted(FUNCTIONS)} positionally")
+        self._code = compile(ast.fix_missing_locations(_BoundOperators().visit(tree)), "<expression>", "eval")
+
+    def evaluate(self, values: Mapping[str, Any]) -> Any:
+        """Evaluates the expression with the specified parameter values."""
+        try:
+            return eval(self._code, _GLOBALS, dict(values))
+        except Exception as e:
+            raise ValueError(f"Failed to evaluate expression '{self.source}': {e}") from e
+
+
+class Template:
+    """
+    A string in which expressions enclosed in braces are replaced with their values, similarly to f-strings:
+    e.g. "{A + B}" or "{price * 1.27:.2f}". Literal braces must be doubled: "{{" and "}}".
+    """
+
+    def __init__(self, source: str, names: Collection[str]) -> None:
+        # Literal text, followed by an expression and its format spec (unless it is the end of the template)
+        self._parts: list[tuple[str, Expression | None, str]] = []
+        literal, position = "", 0
+        for token in _TEMPLATE_TOKEN.finditer(source):
+            literal += source[position : token.start()]
+            position = token.end()
+            if token.group(1) is not None:
+                expression, _, format_spec = token.group(1).partition(":")
+                self._parts.append((literal, Expression(expression, names), format_spec))
+                literal = ""
+            elif len(token.group(0)) == 2:
+                literal += token.group(0)[0]
+            else:
+                raise ValueError(f"Template '{source}' contains an unmatched brace, literal braces must be doubled")
+        self._parts.append((literal + source[position:], None, ""))
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        """Replaces the expressions with their values, formatted according to their format specs."""
+        return "".join(
+            literal if expression is None else literal + format(expression.evaluate(values), format_spec)
+            for literal, expression, format_spec in self._parts
+        )
@@ -0,0 +1,73 @@
+from collections.abc import Sequence
+import hashlib
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class IndexChanges(BaseModel):
+    """The items of a quiz bank that differ from a previous build of the bank."""
+
+    added: list[str] = []
+    """The keys of the items that were not present in the previous build."""
+
+    removed: list[str] = []
+    """The keys of the items that are no longer present."""
+
+    changed: list[str] = []
+    """The keys of the items whose hash differs from the previous build."""
+
+    unchanged: int = 0
+    """The number of items whose hash is the same as in the previous build."""
+
+
+class BankIndex(BaseModel):
+    """
+    The hashes of the items of a quiz bank, written next to its QTI packages, so that changes between builds
+    can be detected without parsing the packages. Items are identified by their input file, configuration file
+    and variant number. Their hash is derived from the text-format quiz: the rendered description and the answers.
+    """
+
+    version: Literal[1] = 1
+    """The version of the index format."""
+
+    items: dict[str, str] = {}
+    """Maps the keys of the items to the SHA-256 hashes of the text-format quizzes."""
+
+    def add(self, input: Path, config: Path, variant_num: int, parts: Sequence[bytes | memoryview]) -> None:
+        """
+        Adds the text-format quiz generated for a variant to the index.
+        If the same input-config pair occurs multiple times within the bank, its keys get an occurrence suffix.
+        """
+        base_key = key = f"{input.name}/{config.name}#{variant_num}"
+        occurrence = 1
+        while key in self.items:
+            occurrence += 1
+            key = f"{base_key} ({occurrence})"
+        sha256 = hashlib.sha256()
+        for part in parts:
+            sha256.update(part)
+        self.items[key] = sha256.hexdigest()
+
+    def compare(self, previous: "BankIndex") -> IndexChanges:
+        """Determines which items were added, removed or changed since the previous build."""
+        changes = IndexChanges()
+        for key, item_hash in self.items.items():
+            if key not in previous.items:
+                changes.added.append(key)
+            elif previous.items[key] != item_hash:
+                changes.changed.append(key)
+            else:
+                changes.unchanged += 1
+        changes.removed = [key for key in previous.items if key not in self.items]
+        return changes
+
+    def save(self, path: Path) -> None:
+        """Writes the index as JSON to the specified path."""
+        path.write_text(self.model_dump_json(indent=2), encoding="utf-8")
+
+    @staticmethod
+    def load_from_json(path: Path) -> "BankIndex":
+        """Load and parse index JSON file found at the specified path."""
+        return BankIndex.model_validate_json(path.read_text(encoding="utf-8"))
@@ -1,57 +1,833 @@
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+import contextlib
+from decimal import Decimal
+import functools
+import hashlib
+import itertools
 import logging
+import mmap
+import multiprocessing
 import os
 from pathlib import Path
+import queue
 import re
+import shutil
+import string
 import subprocess
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Literal, TypeVar, get_args
+
+from pydantic import BaseModel
 
 from canvas_quiz_generator import qtiConverterApp
-from canvas_quiz_generator.config import VariantConfig
+from canvas_quiz_generator.config import GeneratorConfig, QuestionType, VariantConfig
+from canvas_quiz_generator.markdown import markdown_to_html
+from canvas_quiz_generator.memprofile import MemoryProfiler
+from canvas_quiz_generator.minify import minify_html
+from canvas_quiz_generator.report import InputReport, PackageReport
 
 
 _logger = logging.getLogger(__name__)
 
+_K = TypeVar("_K")
+_V = TypeVar("_V")
+
+QuizParts = Sequence[bytes | memoryview]
+"""A text-format quiz as a sequence of UTF-8 encoded parts, which are written to the quiz bank without joining them."""
+
+
+def quiz_str_list_to_bank(
+    quizzes: Iterable[str | QuizParts],
+    output_dir: Path,
+    bank_name: str,
+    max_items_per_package: int | None = None,
+    max_package_bytes: int | None = None,
+    jobs: int = 1,
+    validate_xml: bool = False,
+    preview: bool = True,
+    preview_page_size: int | None = None,
+    reproducible: bool = False,
+    package_reports: list[PackageReport] | None = None,
+    equation_host: str | None = None,
+    memory_profiler: MemoryProfiler | None = None,
+) -> list[Path]:
+    """
+    Aggregates text-format quizzes into a shared quiz bank.
+    The quizzes are consumed lazily and streamed to disk, therefore they may be supplied by a generator.
+    If a package limit is specified, the quizzes are split into multiple self-contained banks (shards),
+    whose names are suffixed with the shard number. Returns the paths of the created QTI ZIP files.
+    The generated XML files are only checked for well-formedness if requested.
+    The HTML preview of the questions is optional and may be split into pages of the specified size.
+    In reproducible mode, the same quizzes always result in the same ZIP files,
+    and the SHA-256 hash of each ZIP is written next to it, so that unchanged packages can be detected.
+    If a list of package reports is specified, the statistics of the created packages are appended to it.
+    The packages are built by the specified number of processes, or if the bank is not split into multiple packages,
+    its questions are converted by that many processes.
+    The images of $$...$$ equations refer to the specified Canvas instance (or the converter's default).
+    If a memory profiler is specified, the memory usage of building each package is measured,
+    unless the packages are built by separate processes.
+    """
+    # The quizzes are rendered on a background thread, while the previous ones are written and converted
+    quizzes = _prefetch(quizzes, _PIPELINE_QUEUE_SIZE)
+    sharded = max_items_per_package is not None or max_package_bytes is not None
+    names = (f"{bank_name}_{shard_num}" if sharded else bank_name for shard_num in itertools.count(1))
+    shards = zip(_split_shards(quizzes, max_items_per_package, max_package_bytes), names)
+    convert = functools.partial(
+        _txt_bank_to_qti_zip,
+        validate_xml=validate_xml,
+        preview=preview,
+        preview_page_size=preview_page_size,
+        reproducible=reproducible,
+        equation_host=equation_host,
+    )
+    if jobs <= 1 or not sharded:
+        # The question blocks are converted as they are written, and the ZIP is compressed on yet another thread.
+        # A single package is parallelized by converting its questions in multiple processes.
+        reports = []
+        for shard, name in shards:
+            quiz_bank_txt = output_dir / f"{name}.txt"
+            with _profiled(memory_profiler, f"package {name}"), quiz_bank_txt.open("wb") as f:
+                blocks = _write_blocks(shard, f)
+                reports.append(convert(quiz_bank_txt, blocks=blocks, workers=jobs, memory_profiler=memory_profiler))
+            _logger.debug("Quiz bank created at '%s'", quiz_bank_txt)
+    else:
+        # Completed shards are converted while the following ones are still being generated
+        # The processes are spawned instead of forked, since the threads of the pipeline might hold locks
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = []
+            for shard, name in shards:
+                quiz_bank_txt = output_dir / f"{name}.txt"
+                with quiz_bank_txt.open("wb") as f:
+                    for parts in shard:
+                        f.writelines(parts)
+                _logger.debug("Quiz bank created at '%s'", quiz_bank_txt)
+                futures.append(executor.submit(convert, quiz_bank_txt))
+            reports = [future.result() for future in futures]
+
+    if package_reports is not None:
+        package_reports.extend(reports)
+    return [report.path for report in reports]
+
+
+class PartHeader(BaseModel):
+    """
+    Describes a part of a quiz bank: the questions converted by one of the machines building the bank together.
+    It is the first line of the part file, followed by the converted questions.
+    """
+
+    version: Literal[1] = 1
+    """The version of the part file format."""
+
+    bank_name: str
+    """The name of the quiz bank."""
+
+    part: int
+    """The number of the part, starting from 1."""
+
+    parts: int
+    """The number of parts the bank was split into."""
+
+    first_number: int
+    """The number of the first question of the part within the bank, starting from 1."""
+
+    questions: int
+    """The number of questions within the part."""
+
+    reproducible: bool
+    """Whether the part was built in reproducible mode."""
+
+    preview: bool
+    """Whether the HTML previews of the questions are included."""
 
-def quiz_str_list_to_bank(quizzes: list[str], output_dir: Path, bank_name: str) -> None:
-    """Aggregates a list of text-format quizzes into a shared quiz bank."""
-    _logger.debug("Generated %d quiz variants, creating quiz bank...", len(quizzes))
+
+def part_file_name(bank_name: str, part: int, parts: int) -> str:
+    return f"{bank_name}_part_{part}_of_{parts}.jsonl.gz"
+
+
+def quiz_str_list_to_partial_bank(
+    quizzes: Iterable[str | QuizParts],
+    output_dir: Path,
+    bank_name: str,
+    part: int,
+    parts: int,
+    first_number: int,
+    question_count: int,
+    jobs: int = 1,
+    preview: bool = True,
+    reproducible: bool = False,
+    package_reports: list[PackageReport] | None = None,
+    equation_host: str | None = None,
+) -> Path:
+    """
+    Aggregates text-format quizzes into a part of a shared quiz bank, which is assembled by merge_partial_banks
+    from all of its parts. The part contains the specified number of quizzes, numbered from the specified number.
+    The quizzes are converted to QTI items, but instead of a package, they are written to a part file,
+    whose path is returned. The text-format quizzes of the part are written next to it, like for a whole bank.
+    """
+    quizzes = _prefetch(quizzes, _PIPELINE_QUEUE_SIZE)
     quiz_bank_txt = output_dir / f"{bank_name}.txt"
-    with quiz_bank_txt.open("w", encoding="utf-8") as f:
-        for quiz in quizzes:
-            f.write(quiz)
+    part_file = output_dir / part_file_name(bank_name, part, parts)
+    header = PartHeader(
+        bank_name=bank_name,
+        part=part,
+        parts=parts,
+        first_number=first_number,
+        questions=question_count,
+        reproducible=reproducible,
+        preview=preview,
+    )
+    _logger.debug("Converting part %d of %d of quiz bank '%s'...", part, parts, bank_name)
+    start = time.perf_counter()
+    qti_maker = qtiConverterApp.makeQti(
+        str(quiz_bank_txt),
+        ".",
+        preview=preview,
+        reproducible=reproducible,
+        workers=jobs,
+        equationHost=equation_host,
+        firstNumber=first_number,
+    )
+    encoded = (((quiz.encode("utf-8"),) if isinstance(quiz, str) else quiz) for quiz in quizzes)
+    with quiz_bank_txt.open("wb") as f:
+        qti_maker.writePart(_write_blocks(encoded, f), part_file, header.model_dump())
+    report = qti_maker.report()
+    if report["questions"] != question_count:
+        raise ValueError(f"Expected {question_count} quizzes in the part, but {report['questions']} were generated")
+    if package_reports is not None:
+        package_reports.append(
+            PackageReport(
+                path=part_file, bytes=part_file.stat().st_size, seconds=time.perf_counter() - start, **report
+            )
+        )
+    return part_file
+
+
+def merge_partial_banks(
+    part_files: Iterable[Path],
+    output_dir: Path,
+    validate_xml: bool = False,
+    preview: bool = True,
+    preview_page_size: int | None = None,
+) -> PackageReport:
+    """
+    Assembles the parts of a quiz bank into a single QTI package, in the order of the parts,
+    the same way it would have been built at once (in reproducible mode, the packages are identical).
+    All parts of the bank must be specified, otherwise ValueError is raised.
+    The images of the questions are taken from the folders of the part files.
+    The preview is only created if the parts contain the HTML previews of the questions.
+    """
+    headers = {}
+    for path in part_files:
+        try:
+            header = PartHeader.model_validate(qtiConverterApp.loadPartHeader(path))
+        except (OSError, EOFError, ValueError) as e:
+            raise ValueError(f"'{path}' is not a valid part file: {e}") from e
+        if header.part in headers:
+            raise ValueError(f"Part {header.part} is specified multiple times: '{headers[header.part][0]}', '{path}'")
+        headers[header.part] = (path, header)
+    if not headers:
+        raise ValueError("No part files were specified")
+
+    _, first = headers[min(headers)]
+    missing = sorted(set(range(1, first.parts + 1)) - set(headers))
+    if missing:
+        raise ValueError(f"The parts {missing} of the {first.parts} parts of quiz bank '{first.bank_name}' are missing")
+    if len(headers) > first.parts:
+        raise ValueError(f"Quiz bank '{first.bank_name}' only has {first.parts} parts, but more were specified")
+    next_number = 1
+    for part in range(1, first.parts + 1):
+        path, header = headers[part]
+        for field in ("bank_name", "parts", "reproducible"):
+            if getattr(header, field) != getattr(first, field):
+                raise ValueError(f"The part file '{path}' belongs to a different build ({field} differs)")
+        if header.first_number != next_number:
+            raise ValueError(f"The part file '{path}' should start with question {next_number}")
+        next_number += header.questions
+
+    paths = [headers[part][0] for part in range(1, first.parts + 1)]
+    if preview and not all(header.preview for _, header in headers.values()):
+        _logger.warning("Some parts were built without the HTML preview, therefore no preview is created.")
+        preview = False
+    _logger.debug("Merging %d parts of quiz bank '%s'...", len(paths), first.bank_name)
+    start = time.perf_counter()
+    qti_maker = qtiConverterApp.makeQti(
+        str(output_dir / f"{first.bank_name}.txt"),
+        ".",
+        validate_xml=validate_xml,
+        preview=preview,
+        preview_page_size=preview_page_size,
+        reproducible=first.reproducible,
+    )
+    qti_maker.run(fragments=_part_fragments(paths, [headers[part][1] for part in range(1, first.parts + 1)]))
+    _logger.debug("Quiz bank ZIP created at '%s'", qti_maker.zipFile)
+    if first.reproducible:
+        _write_checksum(qti_maker.zipFile)
+    return PackageReport(
+        path=qti_maker.zipFile,
+        bytes=qti_maker.zipFile.stat().st_size,
+        seconds=time.perf_counter() - start,
+        **qti_maker.report(),
+    )
+
+
+def _part_fragments(paths: list[Path], headers: list[PartHeader]) -> Iterator["qtiConverterApp.questionFragment"]:
+    """Lazily reads the converted questions of the part files, checking that each part is complete."""
+    for path, header in zip(paths, headers):
+        count = 0
+        for fragment in qtiConverterApp.loadPart(path):
+            count += 1
+            yield fragment
+        if count != header.questions:
+            raise ValueError(f"The part file '{path}' contains {count} questions instead of {header.questions}")
+
+
+_PIPELINE_QUEUE_SIZE = 256
+"""The maximum number of quizzes rendered ahead of the conversion to QTI."""
+
+
+def _profiled(memory_profiler: MemoryProfiler | None, stage: str) -> contextlib.AbstractContextManager:
+    """Measures the memory usage of the stage if there is a profiler."""
+    return contextlib.nullcontext() if memory_profiler is None else memory_profiler.stage(stage)
 
-    _logger.debug("Quiz bank created at '%s', converting to QTI ZIP...", quiz_bank_txt)
-    qti_maker = qtiConverterApp.makeQti(str(quiz_bank_txt), ".")
-    qti_maker.run()
-    _logger.debug("Quiz bank ZIP created at '%s'", qti_maker.newDirPath.with_suffix(".zip"))
+
+def _split_shards(
+    quizzes: Iterable[str | QuizParts], max_items_per_package: int | None, max_package_bytes: int | None
+) -> Iterator[Iterator[QuizParts]]:
+    """
+    Lazily splits the quizzes into shards (at least one, even if there are no quizzes),
+    starting a new shard whenever a limit would be exceeded. Each shard must be fully consumed before the next one.
+    The byte limit is applied to the UTF-8 encoded text-format quizzes, which is only an approximation
+    of the final package size. A single quiz exceeding the byte limit still gets its own shard.
+    """
+    encoded = iter(((quiz.encode("utf-8"),) if isinstance(quiz, str) else quiz) for quiz in quizzes)
+    pending = next(encoded, None)
+
+    def shard() -> Iterator[QuizParts]:
+        nonlocal pending
+        shard_items, shard_bytes = 0, 0
+        while pending is not None:
+            quiz_bytes = sum(len(part) for part in pending)
+            if shard_items > 0 and (
+                (max_items_per_package is not None and shard_items >= max_items_per_package)
+                or (max_package_bytes is not None and shard_bytes + quiz_bytes > max_package_bytes)
+            ):
+                return
+            yield pending
+            shard_items += 1
+            shard_bytes += quiz_bytes
+            pending = next(encoded, None)
+
+    yield shard()
+    while pending is not None:
+        yield shard()
+
+
+def _write_blocks(quizzes: Iterable[QuizParts], f: BinaryIO) -> Iterator[str]:
+    """
+    Writes the quizzes to the text-format quiz bank file,
+    while yielding the question blocks the converter would read from the file.
+    """
+    for parts in quizzes:
+        f.writelines(parts)
+        text = b"".join(parts).decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        yield from qtiConverterApp.normalizeLines(text.split("\n"))
+
+
+def _prefetch(items: Iterable[_V], max_buffered: int) -> Iterator[_V]:
+    """
+    Consumes the items on a background thread, buffering at most the specified number of them,
+    so that producing the items overlaps with processing them. Exceptions are re-raised in the consuming thread.
+    """
+    buffer: queue.Queue[tuple[bool, object]] = queue.Queue(max_buffered)
+    stopped = threading.Event()
+
+    def put(entry: tuple[bool, object]) -> bool:
+        # The consumer might stop before all items are produced, in which case nothing is waiting for them
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((False, item)):
+                    return
+        except BaseException as e:
+            put((True, e))
+        else:
+            put((True, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            done, value = buffer.get()
+            if done:
+                if value is not None:
+                    raise value
+                return
+            yield value  # type: ignore[misc]
+    finally:
+        stopped.set()
+        thread.join()
 
 
-def execute_format_conversion(input: Path, work_dir: Path) -> Path:
+def _txt_bank_to_qti_zip(
+    quiz_bank_txt: Path,
+    validate_xml: bool,
+    preview: bool,
+    preview_page_size: int | None,
+    reproducible: bool = False,
+    blocks: Iterable[str] | None = None,
+    workers: int = 1,
+    equation_host: str | None = None,
+    memory_profiler: MemoryProfiler | None = None,
+) -> PackageReport:
+    """
+    Converts a text-format quiz bank into a QTI ZIP next to it. Returns the statistics of the created ZIP.
+    If the question blocks are specified, they are converted instead of the contents of the file.
+    The questions are converted by the specified number of processes.
+    If a memory profiler is specified, the memory usage of the stages of the conversion is measured.
+    """
+    _logger.debug("Converting quiz bank '%s' to QTI ZIP...", quiz_bank_txt)
+    start = time.perf_counter()
+    qti_maker = qtiConverterApp.makeQti(
+        str(quiz_bank_txt),
+        ".",
+        validate_xml=validate_xml,
+        preview=preview,
+        preview_page_size=preview_page_size,
+        reproducible=reproducible,
+        workers=workers,
+        equationHost=equation_host,
+        memoryProfiler=memory_profiler,
+    )
+    qti_maker.run(blocks)
+    _logger.debug("Quiz bank ZIP created at '%s'", qti_maker.zipFile)
+    if reproducible:
+        _write_checksum(qti_maker.zipFile)
+    return PackageReport(
+        path=qti_maker.zipFile,
+        bytes=qti_maker.zipFile.stat().st_size,
+        seconds=time.perf_counter() - start,
+        **qti_maker.report(),
+    )
+
+
+def _write_checksum(path: Path) -> None:
+    """Writes the SHA-256 hash of the file next to it (with a .sha256 suffix), in the format of sha256sum."""
+    sha256 = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1 << 20):
+            sha256.update(chunk)
+    path.with_name(f"{path.name}.sha256").write_text(f"{sha256.hexdigest()}  {path.name}\n", encoding="utf-8")
+    _logger.debug("SHA-256 hash of '%s': %s", path, sha256.hexdigest())
+
+
+def execute_format_conversion(
+    input: Path,
+    work_dir: Path,
+    markdown_fast_path: bool = True,
+    minify: bool = False,
+    report: InputReport | None = None,
+) -> Path:
     """
     If necessary, converts the specified input file to a supported format.
     The working directory might be used for intermediate files.
-    Returns the converted file's path or the original input file's path if no conversion is necessary.
+    Simple markdown files are converted without pandoc, unless the fast path is disabled.
+    The resulting HTML is minified if requested (even if the input was already HTML), and if a report is specified,
+    the number of bytes removed by the minification is recorded in it.
+    HTML inputs are copied even if they need no conversion, since the intermediate file is memory-mapped,
+    and the user's file might be truncated while it is mapped (e.g. when it is saved in watch mode).
+    Returns the path of the intermediate file.
     """
-    intermediate_file = work_dir / f"{input.name}.html"
-    if input.suffix == ".md":
-        _execute_format_conversion_pandoc(input, intermediate_file)
-    elif input.suffix != ".html":
-        _execute_format_conversion_newline(input, intermediate_file)
-    else:
-        return input
+    intermediate_file, minified_bytes = _convert(input, work_dir, markdown_fast_path, minify)
+    if report is not None:
+        report.minified_bytes = minified_bytes
     return intermediate_file
 
 
+def _convert(
+    input: Path, work_dir: Path, markdown_fast_path: bool, minify: bool, digest: str | None = None
+) -> tuple[Path, int]:
+    """
+    Same as execute_format_conversion, but returns the number of bytes removed by the minification as well.
+    The digest of the conversion (see _conversion_digest) is computed unless it is specified.
+    """
+    if digest is None:
+        digest = _conversion_digest(input, markdown_fast_path, minify)
+    # The intermediate file is named after the conversion, so that inputs with the same name in different folders
+    # don't overwrite each other's results. A previous conversion of the same file might still be memory-mapped
+    # by a template, whose quizzes are being written, so the result is written to a new file, which then replaces it
+    intermediate_file = work_dir / f"{input.name}.{digest[:16]}.html"
+    fd, temp_name = tempfile.mkstemp(suffix=".html", prefix=f".{input.name}.", dir=work_dir)
+    os.close(fd)
+    temp_file, minified_bytes = Path(temp_name), 0
+    try:
+        if input.suffix == ".md":
+            _execute_format_conversion_markdown(input, temp_file, markdown_fast_path)
+        elif input.suffix != ".html":
+            _execute_format_conversion_newline(input, temp_file)
+        else:
+            shutil.copyfile(input, temp_file)
+        if minify:
+            text = temp_file.read_text(encoding="utf-8")
+            minified = minify_html(text)
+            temp_file.write_text(minified, encoding="utf-8", newline="")
+            minified_bytes = len(text.encode("utf-8")) - len(minified.encode("utf-8"))
+            _logger.debug("Minification removed %d bytes from the description '%s'", minified_bytes, input)
+        os.replace(temp_file, intermediate_file)
+    except BaseException:
+        temp_file.unlink()
+        raise
+    return intermediate_file, minified_bytes
+
+
+def _conversion_digest(input: Path, markdown_fast_path: bool, minify: bool) -> str:
+    """Identifies the result of converting the input: a hash of its content, its format and the conversion options."""
+    sha256 = hashlib.sha256(input.read_bytes())
+    sha256.update(f"\n{input.suffix}\n{markdown_fast_path}\n{minify}".encode())
+    return sha256.hexdigest()
+
+
 def generate_variant(config: VariantConfig, input: Path) -> str:
     """
     Generates a single quiz variant based on the provided config and input file.
     The input file must be in one of the supported formats.
     """
+    return b"".join(next(generate_variants([config], input))).decode("utf-8")
+
+
+def generate_variants(
+    configs: Iterable[VariantConfig],
+    input: Path,
+    cache: "BuildCache | None" = None,
+    report: InputReport | None = None,
+) -> Iterator[QuizParts]:
+    """
+    Lazily generates a quiz variant for each of the provided configs based on the input file.
+    The configs are consumed lazily as well, therefore they may be supplied by a generator.
+    The input file must be in one of the supported formats. It is only read and searched once,
+    therefore missing placeholders and answer fields are only reported once as well.
+    If a cache is specified, the parsed input file is shared with other calls using the same cache.
+    If a report is specified, the missing placeholders and answer fields and the number of quizzes are recorded in it,
+    and it is up to the caller to report the missing ones. Otherwise they are logged.
+    """
     if input.suffix != ".html":
         raise ValueError(f"The input file's format ({input.suffix}) is not supported")
+    configs = iter(configs)
+    first_config = next(configs, None)
+    if first_config is None:
+        return
+
+    if cache is None:
+        template = QuizTemplate(input, first_config.placeholders.keys())
+    else:
+        template = cache.template(input, first_config.placeholders.keys())
+    missing_answer_fields = _missing_answer_fields(template, first_config)
+    if report is not None:
+        report.missing_placeholders = list(template.missing_placeholders)
+        report.missing_answer_fields = missing_answer_fields
+    else:
+        for placeholder in template.missing_placeholders:
+            _logger.warning("Placeholder '%s' not found in quiz description.", placeholder)
+        for answer_field in missing_answer_fields:
+            _logger.error(
+                "Answer field '[%s]' not found in quiz description. The student will have no way to enter the answer.",
+                answer_field,
+            )
+
+    for variant_num, config in enumerate(itertools.chain([first_config], configs), start=1):
+        _logger.debug("Processing variant #%d: %s", variant_num, config)
+        if report is not None:
+            report.quizzes += 1
+        yield template.render(config)
+
+
+def check_input(
+    input: Path, config: GeneratorConfig, work_dir: Path, markdown_fast_path: bool = True, minify: bool = False
+) -> tuple[list[str], list[str]]:
+    """
+    Converts the input file the same way as a build does, then determines which placeholders and answer fields
+    of the config do not occur in it, without generating any variants. All variants of a config have the same
+    placeholders and answer fields, therefore only the first one is checked.
+    The working directory might be used for intermediate files.
+    Returns the missing placeholders and the missing answer fields.
+    """
+    first_config = next(config.iter_variants(), None)
+    if first_config is None:
+        return [], []
+    intermediate_file = execute_format_conversion(input, work_dir, markdown_fast_path, minify)
+    template = QuizTemplate(intermediate_file, first_config.placeholders.keys())
+    return list(template.missing_placeholders), _missing_answer_fields(template, first_config)
+
+
+def _missing_answer_fields(template: "QuizTemplate", config: VariantConfig) -> list[str]:
+    """The answer fields of the config that do not occur in the description (enclosed in square brackets)."""
+    # Only MB and MD questions have answer fields, which must be present in the description
+    if config.question_type not in ("MB", "MD"):
+        return []
+    return [answer_field for answer_field in config.answer_fields if not template.contains(f"[{answer_field}]")]
+
+
+class QuizTemplate:
+    """
+    A memory-mapped quiz description split at its placeholders and line breaks (which are not allowed
+    in the text-format quizzes). Variants are assembled from zero-copy slices of the mapped file,
+    so the description is only searched once and the shared text is never copied for the individual variants.
+    The mapping is released once the template and all rendered variants are no longer referenced.
+    """
+
+    def __init__(self, input: Path, placeholders: Iterable[str]) -> None:
+        self.placeholders = [placeholder for placeholder in placeholders if placeholder]
+        with input.open("rb") as f:
+            try:
+                self._data: mmap.mmap | bytes = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Empty files cannot be mapped
+                self._data = b""
+        buffer = memoryview(self._data)
+
+        # Literal slices of the description and indices of the placeholders that have to be inserted between them
+        self._segments: list[memoryview | int] = []
+        alternatives = [b"(" + re.escape(placeholder.encode("utf-8")) + b")" for placeholder in self.placeholders]
+        pattern = re.compile(b"|".join([rb"[\r\n]+", *alternatives]))
+        found, position = set(), 0
+        for match in pattern.finditer(buffer):
+            if match.start() > position:
+                self._segments.append(buffer[position : match.start()])
+            if match.lastindex is not None:
+                self._segments.append(match.lastindex - 1)
+                found.add(match.lastindex - 1)
+            position = match.end()
+        if position < len(buffer):
+            self._segments.append(buffer[position:])
+
+        self.missing_placeholders = [p for i, p in enumerate(self.placeholders) if i not in found]
+        """The placeholders that do not occur in the description."""
+
+    def contains(self, text: str) -> bool:
+        """Determines whether the specified text occurs in the description."""
+        return self._data.find(text.encode("utf-8")) != -1
+
+    def render(self, config: VariantConfig) -> QuizParts:
+        """
+        Converts the description into a text-format quiz by replacing the placeholders with the values of the config.
+        The placeholders are replaced in a single pass: placeholders within the inserted values are kept as-is.
+        """
+        values = [
+            config.placeholders[placeholder].replace("\r", "").replace("\n", "").encode("utf-8")
+            for placeholder in self.placeholders
+        ]
+        answers = "".join(line + os.linesep for line in _ANSWER_LINES[config.question_type](config))
+        parts: list[bytes | memoryview] = [_QUESTION_HEADERS[config.question_type]]
+        parts.extend(values[segment] if isinstance(segment, int) else segment for segment in self._segments)
+        parts.append(f"{os.linesep}{answers}{os.linesep}".encode())
+        return parts
+
+
+class BuildCache:
+    """
+    Thread-safe cache of format conversions and parsed templates, shared by the builds of multiple quiz banks.
+    Inputs and templates are identified by their content, not by their paths, so the same description used
+    by different banks is only converted and parsed once, while different descriptions with the same file name
+    are kept apart. Each entry is only computed once, even if it is requested concurrently.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._conversions: dict[str, Future[tuple[Path, int]]] = {}
+        self._templates: dict[tuple[str, tuple[str, ...]], Future[QuizTemplate]] = {}
+
+    def convert(
+        self,
+        input: Path,
+        work_dir: Path,
+        markdown_fast_path: bool = True,
+        minify: bool = False,
+        report: InputReport | None = None,
+    ) -> Path:
+        """
+        Same as execute_format_conversion, but the result of a previous conversion of an input
+        with the same content is reused: its path, which might be within the work directory of another build.
+        """
+        digest = _conversion_digest(input, markdown_fast_path, minify)
+        intermediate_file, minified_bytes = self._get(
+            self._conversions, digest, lambda: _convert(input, work_dir, markdown_fast_path, minify, digest)
+        )
+        if report is not None:
+            report.minified_bytes = minified_bytes
+        return intermediate_file
+
+    def template(self, input: Path, placeholders: Iterable[str]) -> "QuizTemplate":
+        """Returns the template of the input file with the specified placeholders, parsing its content only once."""
+        key = (hashlib.sha256(input.read_bytes()).hexdigest(), tuple(placeholders))
+        return self._get(self._templates, key, lambda: QuizTemplate(input, key[1]))
+
+    def _get(self, cache: dict[_K, Future[_V]], key: _K, compute: Callable[[], _V]) -> _V:
+        """Returns the cached value of the key, computing it if this is the first request for it."""
+        with self._lock:
+            future = cache.get(key)
+            owner = future is None
+            if owner:
+                future = cache[key] = Future()
+        if owner:
+            try:
+                future.set_result(compute())
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
+
+class RenderCache:
+    """
+    Cache of the format conversions and rendered quizzes of input-config pairs, kept between the builds of watch mode.
+    A pair is only rendered again if its input file was modified or its config was reloaded (is another object),
+    and an input is only converted again if it was modified. The rendered quizzes are copied into memory,
+    so that they don't refer to the memory-mapped intermediate files. Each conversion of an input has its own
+    intermediate file (named after its content), the outdated ones are removed once no input refers to them.
+    """
+
+    def __init__(self) -> None:
+        self._conversions: dict[Path, tuple[tuple[int, int, bool, bool], tuple[Path, int]]] = {}
+        self._rendered: dict[
+            tuple[Path, Path], tuple[tuple[int, int, bool, bool], GeneratorConfig, InputReport, list[QuizParts]]
+        ] = {}
+
+    def quizzes(
+        self,
+        input: Path,
+        config: GeneratorConfig,
+        config_path: Path,
+        work_dir: Path,
+        markdown_fast_path: bool,
+        minify: bool,
+        report: InputReport,
+    ) -> Iterator[QuizParts]:
+        """
+        Same as converting the input via execute_format_conversion and generating its variants via generate_variants,
+        but the previous results are reused if neither the input nor the config changed since then.
+        The conversion happens immediately, the quizzes are generated lazily.
+        """
+        stat = input.stat()
+        signature = (stat.st_mtime_ns, stat.st_size, markdown_fast_path, minify)
+        key = (input.resolve(), config_path.resolve())
+        rendered = self._rendered.get(key)
+        if rendered is not None and rendered[0] == signature and rendered[1] is config:
+            report.quizzes = rendered[2].quizzes
+            report.missing_placeholders = rendered[2].missing_placeholders
+            report.missing_answer_fields = rendered[2].missing_answer_fields
+            report.minified_bytes = rendered[2].minified_bytes
+            return iter(rendered[3])
+
+        conversion = self._conversions.get(key[0])
+        if conversion is None or conversion[0] != signature:
+            outdated = conversion
+            conversion = self._conversions[key[0]] = (signature, _convert(input, work_dir, markdown_fast_path, minify))
+            if outdated is not None:
+                self._remove_unused(outdated[1][0])
+        intermediate_file, report.minified_bytes = conversion[1]
+        quizzes = generate_variants(config.iter_variants(), intermediate_file, None, report)
+        return self._render(key, signature, config, quizzes, report)
+
+    def _remove_unused(self, intermediate_file: Path) -> None:
+        """Removes an intermediate file created by a conversion, unless another input's conversion still uses it."""
+        if all(conversion[1][0] != intermediate_file for conversion in self._conversions.values()):
+            # Quizzes that are still being written might have it mapped, but they keep the contents of removed files
+            with contextlib.suppress(OSError):
+                intermediate_file.unlink()
+
+    def _render(
+        self,
+        key: tuple[Path, Path],
+        signature: tuple[int, int, bool, bool],
+        config: GeneratorConfig,
+        quizzes: Iterable[QuizParts],
+        report: InputReport,
+    ) -> Iterator[QuizParts]:
+        """Yields copies of the quizzes, caching them once all of them were generated."""
+        rendered: list[QuizParts] = []
+        for parts in quizzes:
+            quiz = (b"".join(parts),)
+            rendered.append(quiz)
+            yield quiz
+        self._rendered[key] = (signature, config, report.model_copy(deep=True), rendered)
 
-    quiz_description = input.read_text()
-    quiz_description = _replace_placeholders(config, quiz_description)
-    return _to_canvas_quiz_str(config, quiz_description)
+
+def _mb_answer_lines(config: VariantConfig) -> Iterator[str]:
+    """Text-format answers of a fill in multiple blanks question: one line per blank."""
+    for answer_field, answer_value in config.answer_fields.items():
+        yield f"{answer_field}: {answer_value}"
+
+
+def _md_answer_lines(config: VariantConfig) -> Iterator[str]:
+    """Text-format answers of a multiple dropdowns question: the correct option is marked with an asterisk."""
+    for answer_field, answer_value in config.answer_fields.items():
+        yield f"*{answer_field}: {answer_value}"
+        for distractor in config.distractors.get(answer_field, []):
+            yield f"{answer_field}: {distractor}"
+
+
+def _choice_answer_lines(config: VariantConfig) -> Iterator[str]:
+    """Text-format answers of a multiple choice/answers question: the correct options are marked with an asterisk."""
+    for letter, choice in zip(string.ascii_letters, config.choices):
+        yield f"{'*' if choice.correct else ''}{letter}. {choice.text}"
+
+
+def _sa_answer_lines(config: VariantConfig) -> Iterator[str]:
+    """Text-format answers of a short answer question: one line per accepted answer."""
+    for answer_num, answer in enumerate(config.answers, start=1):
+        yield f"{answer_num}. {answer}"
+
+
+def _nu_answer_lines(config: VariantConfig) -> Iterator[str]:
+    """Text-format answers of a numerical question: the exact answer and the accepted range, if any."""
+
+    def number(value: float) -> str:
+        # The shortest representation of the float, but never in scientific notation
+        return format(Decimal(repr(value)), "f")
+
+    for answer in config.numerical_answers:
+        line = f"ans: {number(answer.value)}"
+        if answer.margin > 0:
+            line += f" ({number(answer.value - answer.margin)}, {number(answer.value + answer.margin)})"
+        yield line
+
+
+_QUESTION_HEADERS: dict[str, bytes] = {
+    question_type: f"{question_type}{os.linesep}1. ".encode() for question_type in get_args(QuestionType)
+}
+"""The encoded text preceding the description of each question type."""
+
+_ANSWER_LINES: dict[str, Callable[[VariantConfig], Iterator[str]]] = {
+    "MB": _mb_answer_lines,
+    "MD": _md_answer_lines,
+    "MC": _choice_answer_lines,
+    "MA": _choice_answer_lines,
+    "SA": _sa_answer_lines,
+    "NU": _nu_answer_lines,
+}
+"""Creates the text-format answer lines of each question type."""
+
+
+def _execute_format_conversion_markdown(input: Path, output: Path, fast_path: bool) -> None:
+    """
+    Converts the markdown input to HTML: in-process if only the commonly used subset of markdown is used,
+    otherwise using pandoc. Line breaks within <pre> blocks are converted to <br> in both cases.
+    """
+    text = markdown_to_html(input.read_text(encoding="utf-8")) if fast_path else None
+    if text is None:
+        _execute_format_conversion_pandoc(input, output)
+        text = output.read_text(encoding="utf-8")
+    else:
+        _logger.debug("Converted '%s' without pandoc", input)
+    output.write_text(_replace_verbatim_newlines(text), encoding="utf-8")
 
 
 def _execute_format_conversion_pandoc(input: Path, output: Path) -> None:
@@ -81,17 +857,20 @@ def _execute_format_conversion_pandoc(input: Path, output: Path) -> None:
             f"The 'pandoc' command returned with exit code {proc.returncode} and the following stderr: {proc.stderr.strip()}"
         )
 
-    # Convert line breaks within <pre> blocks to <br>. Ideally this should be done by pandoc,
-    # who has access to the text AST, but I wasn't able to get it done using pandoc filters.
+
+def _replace_verbatim_newlines(text: str) -> str:
+    """
+    Converts line breaks within <pre> blocks to <br>. Ideally this should be done by pandoc,
+    who has access to the text AST, but I wasn't able to get it done using pandoc filters.
+    """
+
     def replace_verbatim_newline(match: re.Match) -> str:
         open_tag, content, close_tag = match.group(1), match.group(2), match.group(3)
         content = content.replace("\r\n", "\n").replace("\r", "\n").replace("\n", "<br>")
         return open_tag + content + close_tag
 
     verbatim_pattern = re.compile(r"(<pre[^>]*><code[^>]*>)(.*?)(</code></pre>)", re.S | re.I)
-    text = output.read_text(encoding="utf-8")
-    text = verbatim_pattern.sub(replace_verbatim_newline, text)
-    output.write_text(text, encoding="utf-8")
+    return verbatim_pattern.sub(replace_verbatim_newline, text)
 
 
 def _execute_format_conversion_newline(input: Path, output: Path) -> None:
@@ -102,36 +881,3 @@ def _execute_format_conversion_newline(input: Path, output: Path) -> None:
     with input.open("r", encoding="utf-8") as fin, output.open("w", encoding="utf-8") as fout:
         for line in fin:
             fout.write(line.rstrip("\r\n") + "<br>")
-
-
-def _replace_placeholders(config: VariantConfig, quiz_description: str) -> str:
-    """
-    Executes the placeholder replacement in the quiz description.
-    A warning is logged if a placeholder is not found in the description.
-    """
-    for placeholder, value in config.placeholders.items():
-        if placeholder not in quiz_description:
-            _logger.warning("Placeholder '%s' not found in quiz description.", placeholder)
-        quiz_description = quiz_description.replace(placeholder, value)
-    return quiz_description
-
-
-def _to_canvas_quiz_str(config: VariantConfig, quiz_description: str) -> str:
-    """
-    Converts the specified values into a text-format quiz string.
-    An error is logged if an answer field is not found in the quiz description.
-    """
-    quiz_str = "MB"
-    quiz_str += os.linesep
-    quiz_str += "1. " + quiz_description.replace("\r", "").replace("\n", "")
-    quiz_str += os.linesep
-    for answer_field, answer_value in config.answer_fields.items():
-        if f"[{answer_field}]" not in quiz_description:
-            _logger.error(
-                "Answer field '[%s]' not found in quiz description. The student will have no way to enter the answer.",
-                answer_field,
-            )
-        quiz_str += f"{answer_field}: {answer_value}"
-        quiz_str += os.linesep
-    quiz_str += os.linesep
-    return quiz_str
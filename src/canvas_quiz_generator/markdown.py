@@ -0,0 +1,160 @@
+"""
+In-process Markdown to HTML conversion for the subset of Markdown most quiz descriptions use:
+paragraphs, hard line breaks, inline code, bold text and fenced code blocks without a language.
+The output matches pandoc's (invoked with --wrap=none) for this subset. Inputs that may contain any other syntax,
+or text pandoc would treat specially (e.g. smart quotes, dashes, abbreviations), are rejected,
+so that the caller can fall back to pandoc.
+"""
+
+import re
+
+
+_UNSUPPORTED_LINE = re.compile(
+    r"^(\s{4,}|\t)"  # indented code blocks
+    r"|^\s{0,3}([#>+=:%|~<]|[-*](\s|$)|[-=*_]{2,}\s*$)"  # headers, quotes, lists, rules, tables, divs, raw HTML
+    r"|^\s{0,3}\(?(\d+|[a-zA-Z]|[ivxlcdmIVXLCDM]+|@\w*)[.)](\s|$)"  # ordered and example lists
+)
+"""Matches the lines which might start a block other than a paragraph."""
+
+_UNSUPPORTED_TEXT = re.compile(
+    r"""[\\$^~@<>{}"|\t]"""  # escapes, math, super/subscripts, citations, raw HTML, quotes, attributes, tables
+    r"|(?<![^\W_])_|_(?![^\W_])"  # emphasis using underscores (intraword underscores are literal)
+    r"|--|\.\.\."  # smart dashes and ellipses
+    r"|!\[|\]\(|\]\[|\]:|\[\^|\[@"  # images, links, references, footnotes, citations
+    r"|&(#|\w+;)"  # entities
+    r"|(?<![^\s(])([A-Z][a-z]{0,3}|[a-z]{1,3}|(\w+\.)+\w+)\.(\s|$)"  # abbreviations followed by non-breaking spaces
+)
+"""Matches the text (outside of code) pandoc would not output as-is."""
+
+_APOSTROPHE = re.compile(r"(?<=[^\W_])'(?=[^\W_])")
+"""Matches the apostrophes within words, which are converted to typographic apostrophes."""
+
+_FENCE = re.compile(r"^(`{3,})\s*$")
+"""Matches the opening and closing lines of fenced code blocks without a language."""
+
+
+def markdown_to_html(text: str) -> str | None:
+    """
+    Converts the Markdown text to HTML if it only uses the supported subset of Markdown.
+    Returns None if unsupported syntax is detected.
+    """
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    blocks: list[str] = []
+    paragraph: list[str] = []
+    line_num = 0
+    while line_num < len(lines):
+        line = lines[line_num]
+        fence = _FENCE.match(line)
+        if fence is not None:
+            # Pandoc requires code blocks to be separated from paragraphs by a blank line
+            if paragraph:
+                return None
+            end = next(
+                (
+                    end
+                    for end in range(line_num + 1, len(lines))
+                    if (closing := _FENCE.match(lines[end])) and len(closing.group(1)) >= len(fence.group(1))
+                ),
+                None,
+            )
+            if end is None:
+                return None
+            # Pandoc expands tabs to 4-column tab stops before parsing, which is only visible within code blocks
+            code = "\n".join(line.expandtabs(4) for line in lines[line_num + 1 : end])
+            blocks.append(f"<pre><code>{_escape_code_block(code)}</code></pre>")
+            line_num = end
+        elif not line.strip():
+            if paragraph:
+                html = _paragraph_to_html(paragraph)
+                if html is None:
+                    return None
+                blocks.append(html)
+                paragraph = []
+        elif line.lstrip().startswith("```"):
+            return None
+        else:
+            paragraph.append(line)
+        line_num += 1
+
+    if paragraph:
+        html = _paragraph_to_html(paragraph)
+        if html is None:
+            return None
+        blocks.append(html)
+    return "".join(block + "\n" for block in blocks)
+
+
+def _paragraph_to_html(lines: list[str]) -> str | None:
+    """Converts the lines of a paragraph to HTML. Returns None if unsupported syntax is detected."""
+    if any(_UNSUPPORTED_LINE.match(line) for line in lines):
+        return None
+
+    html, bold = "", False
+    for line_num, line in enumerate(lines):
+        last_line = line_num == len(lines) - 1
+        result = _inlines_to_html(line.strip(), bold, last_line)
+        if result is None:
+            return None
+        line_html, bold = result
+        html += line_html
+        if not last_line:
+            html += "<br />\n" if line.endswith("  ") else " "
+    if bold:
+        return None
+    return f"<p>{html}</p>"
+
+
+def _inlines_to_html(line: str, bold: bool, last_line: bool) -> tuple[str, bool] | None:
+    """
+    Converts a line of a paragraph to HTML, considering whether bold text is open at its start.
+    Returns the HTML and whether bold text is open at the end of the line, or None if unsupported syntax is detected.
+    """
+    pieces = line.split("`")
+    if len(pieces) % 2 == 0 or "\x00" in line:
+        return None
+
+    # Code spans are masked with a placeholder character, so that the text can be processed as a whole
+    code_spans = []
+    for piece in pieces[1::2]:
+        if not piece or piece != piece.strip() or any(c in piece for c in "\"'\t"):
+            return None
+        code_spans.append(f"<code>{piece.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')}</code>")
+    text = "\x00".join(pieces[::2])
+
+    if _UNSUPPORTED_TEXT.search(text if last_line else text + " "):
+        return None
+    text = _APOSTROPHE.sub("’", text)
+    if "'" in text or "***" in text:
+        return None
+    text = re.sub(" +", " ", text).replace("&", "&amp;")
+
+    html, position = "", 0
+    for marker in re.finditer(r"\*\*", text):
+        before = text[marker.start() - 1] if marker.start() > 0 else " "
+        after = text[marker.end()] if marker.end() < len(text) else " "
+        if not bold and not after.isspace():
+            tag = "<strong>"
+        elif bold and not before.isspace():
+            tag = "</strong>"
+        else:
+            return None
+        html += text[position : marker.start()] + tag
+        position, bold = marker.end(), not bold
+    html += text[position:]
+    if "*" in html:
+        return None
+
+    for code_span in code_spans:
+        html = html.replace("\x00", code_span, 1)
+    return html, bold
+
+
+def _escape_code_block(code: str) -> str:
+    """Escapes the content of a code block the same way pandoc does."""
+    return (
+        code.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+        .replace("'", "&#39;")
+    )
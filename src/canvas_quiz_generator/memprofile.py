@@ -0,0 +1,91 @@
+"""Memory profiling of the stages of a build via tracemalloc."""
+
+from collections.abc import Iterator
+import contextlib
+import logging
+import threading
+import tracemalloc
+
+from canvas_quiz_generator.report import MemoryStageReport
+
+
+_logger = logging.getLogger(__name__)
+
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>")
+"""The allocations of these files are not attributed to the stages."""
+
+
+class MemoryProfiler:
+    """
+    Measures the memory allocated by Python during the stages of a build: the peak while the stage was running,
+    the memory retained at its end and the source lines that retained the most. Stages may be nested.
+    Only the current process is traced, the stages running in worker processes are not measured.
+    Tracing starts when the profiler is created, and it slows down the build considerably.
+    """
+
+    def __init__(self, top_sites: int = 5) -> None:
+        self.top_sites = top_sites
+        self.stages: list[MemoryStageReport] = []
+        """The measurements of the finished stages, in the order they finished."""
+        self._lock = threading.Lock()
+        self._open_peaks: list[list[int]] = []
+        tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measures the memory usage of the code executed within the context."""
+        start_snapshot = self._snapshot()
+        with self._lock:
+            self._update_peaks()
+            start_current = tracemalloc.get_traced_memory()[0]
+            peak = [start_current]
+            self._open_peaks.append(peak)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._update_peaks()
+                # Removed by identity: the peaks of nested stages are often equal
+                self._open_peaks = [open_peak for open_peak in self._open_peaks if open_peak is not peak]
+                current = tracemalloc.get_traced_memory()[0]
+            differences = self._snapshot().compare_to(start_snapshot, "lineno")
+            self.stages.append(
+                MemoryStageReport(
+                    name=name,
+                    peak_bytes=peak[0],
+                    retained_bytes=current - start_current,
+                    top_sites={
+                        f"{difference.traceback[0].filename}:{difference.traceback[0].lineno}": difference.size_diff
+                        for difference in differences[: self.top_sites]
+                    },
+                )
+            )
+
+    def log(self) -> None:
+        """Logs the measurements of the finished stages."""
+        for stage in self.stages:
+            _logger.info(
+                "Memory of stage '%s': peak %.1f MiB, retained %+.1f MiB",
+                stage.name,
+                stage.peak_bytes / 2**20,
+                stage.retained_bytes / 2**20,
+            )
+            for site, size in stage.top_sites.items():
+                _logger.info("  %+10.1f KiB  %s", size / 2**10, site)
+
+    def stop(self) -> None:
+        """Stops tracing the memory allocations."""
+        tracemalloc.stop()
+
+    def _update_peaks(self) -> None:
+        """Records the peak since the previous stage boundary in all running stages, then resets it."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for open_peak in self._open_peaks:
+            open_peak[0] = max(open_peak[0], peak)
+        tracemalloc.reset_peak()
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+        )
@@ -0,0 +1,46 @@
+"""
+Minification of the HTML quiz descriptions, which are embedded in every variant of a quiz. Only changes that don't
+affect how the HTML is rendered are made: comments, empty paragraphs and the whitespace around block-level tags
+are removed, and runs of spaces and tabs are collapsed. The contents of <pre>, <textarea>, <script> and <style>
+elements are kept as-is. Line breaks are kept as well, since they are handled when the description is parsed.
+"""
+
+import re
+
+
+_VERBATIM = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.S | re.I)
+"""Matches the elements whose contents must not be changed."""
+
+_COMMENT = re.compile(r"<!--.*?-->", re.S)
+"""Matches the HTML comments."""
+
+_SPACES = re.compile(r"[ \t]{2,}|\t")
+"""Matches the runs of spaces and tabs which can be replaced by a single space."""
+
+_BLOCK_TAG = re.compile(
+    r"[ \t]*(</?(?:address|article|aside|blockquote|br|dd|div|dl|dt|figcaption|figure|footer|h[1-6]|header|hr|li"
+    r"|main|nav|ol|p|section|table|tbody|td|tfoot|th|thead|tr|ul)\b[^>]*>)[ \t]*",
+    re.I,
+)
+"""Matches the block-level tags (and line breaks) with the surrounding spaces and tabs, which are not rendered."""
+
+_EMPTY_PARAGRAPH = re.compile(r"<p>[ \t]*</p>", re.I)
+"""Matches the paragraphs without any content."""
+
+
+def minify_html(text: str) -> str:
+    """Minifies the HTML text without changing how it is rendered."""
+    pieces = _VERBATIM.split(text)
+    # The split text consists of (other, verbatim element, tag name) triples, ending with another piece
+    for i in range(0, len(pieces), 3):
+        piece = _COMMENT.sub("", pieces[i])
+        piece = _SPACES.sub(" ", piece)
+        piece = _BLOCK_TAG.sub(r"\1", piece)
+        piece = _EMPTY_PARAGRAPH.sub("", piece)
+        # <pre> is a block-level element as well
+        if i > 0 and pieces[i - 1].lower() == "pre":
+            piece = piece.lstrip(" \t")
+        if i + 2 < len(pieces) and pieces[i + 2].lower() == "pre":
+            piece = piece.rstrip(" \t")
+        pieces[i] = piece
+    return "".join(piece for i, piece in enumerate(pieces) if i % 3 != 2)
@@ -0,0 +1,213 @@
+"""
+Publishing of the generated QTI packages to a Canvas course via the content migration API:
+a migration is created for each package, the ZIP is uploaded to the URL Canvas returns, then the import is awaited.
+Only the standard library is used, and any server implementing the same API (e.g. a local mock server) can be used.
+"""
+
+from collections.abc import Callable, Iterable, Iterator
+import http.client
+import json
+import logging
+from pathlib import Path
+import secrets
+import threading
+import time
+from typing import Any
+import urllib.parse
+
+
+_logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1 << 20
+"""The number of bytes of the package read and sent at once while uploading it."""
+
+_POLL_INTERVAL = 2.0
+"""The number of seconds between checking whether an import has finished."""
+
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD"})
+"""The methods of the requests that may be sent again if the connection was closed before a response was received."""
+
+
+class CanvasClient:
+    """
+    A minimal client of the Canvas REST API, which may be used by multiple threads at once.
+    The connections are kept alive and reused by the following requests to the same host,
+    and the packages are streamed from disk in chunks instead of being read into memory.
+    """
+
+    def __init__(self, base_url: str, token: str, timeout: float = 60, import_timeout: float = 3600) -> None:
+        self.base_url = base_url.rstrip("/")
+        self._token = token
+        self._timeout = timeout
+        self._import_timeout = import_timeout
+        """The number of seconds to wait for an import to finish."""
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        """The idle connections, by scheme and host."""
+
+    def import_package(self, course_id: str, package: Path, wait: bool = True) -> str:
+        """
+        Imports the QTI ZIP into the course as a new question bank.
+        Unless not waiting, returns once the import has finished. Returns the state of the import.
+        Raises RuntimeError if a request or the import fails, or if the import doesn't finish in time.
+        """
+        size = package.stat().st_size
+        migration = self._json(
+            "POST",
+            f"{self.base_url}/api/v1/courses/{urllib.parse.quote(course_id, safe='')}/content_migrations",
+            {
+                "migration_type": "qti_converter",
+                "pre_attachment[name]": package.name,
+                "pre_attachment[size]": str(size),
+                "pre_attachment[content_type]": "application/zip",
+            },
+        )
+        attachment = migration.get("pre_attachment", {})
+        if "upload_url" not in attachment:
+            raise RuntimeError(f"Canvas didn't accept the upload of '{package.name}': {attachment.get('message')}")
+
+        _logger.debug("Uploading '%s' (%d bytes) to '%s'...", package, size, attachment["upload_url"])
+        boundary = secrets.token_hex(16)
+        head, tail = _multipart_envelope(
+            boundary, attachment.get("upload_params", {}), attachment.get("file_param", "file"), package.name
+        )
+
+        def body() -> Iterator[bytes]:
+            yield head
+            with package.open("rb") as f:
+                while chunk := f.read(_CHUNK_SIZE):
+                    yield chunk
+            yield tail
+
+        status, headers, data = self._request(
+            "POST",
+            attachment["upload_url"],
+            body,
+            {
+                "Content-Type": f"multipart/form-data; boundary={boundary}",
+                "Content-Length": str(len(head) + size + len(tail)),
+            },
+        )
+        if 300 <= status < 400:
+            # The file is only attached to the migration once the upload is confirmed
+            self._json("GET", urllib.parse.urljoin(attachment["upload_url"], headers["Location"]))
+        elif status not in (200, 201):
+            raise RuntimeError(f"Failed to upload '{package.name}': HTTP {status} {_excerpt(data)}")
+
+        if not wait:
+            return migration.get("workflow_state", "queued")
+        _logger.debug("Waiting for the import of '%s' to finish...", package)
+        deadline = time.monotonic() + self._import_timeout
+        while True:
+            progress = self._json("GET", migration["progress_url"])
+            if progress["workflow_state"] in ("completed", "failed"):
+                break
+            if time.monotonic() + _POLL_INTERVAL > deadline:
+                raise RuntimeError(
+                    f"The import of '{package.name}' didn't finish in {self._import_timeout:g} seconds"
+                    f" (state: {progress['workflow_state']})"
+                )
+            time.sleep(_POLL_INTERVAL)
+        if progress["workflow_state"] == "failed":
+            raise RuntimeError(f"Canvas failed to import '{package.name}': {progress.get('message')}")
+        return progress["workflow_state"]
+
+    def close(self) -> None:
+        """Closes the idle connections."""
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+    def _json(self, method: str, url: str, form: dict[str, str] | None = None) -> dict[str, Any]:
+        """Sends a request, optionally with a URL-encoded form, and parses the JSON response."""
+        body, headers = None, {}
+        if form is not None:
+            body = urllib.parse.urlencode(form).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        status, _, data = self._request(method, url, body, headers)
+        if not 200 <= status < 300:
+            raise RuntimeError(f"{method} {url} failed: HTTP {status} {_excerpt(data)}")
+        return json.loads(data)
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        body: bytes | Callable[[], Iterable[bytes]] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> tuple[int, http.client.HTTPMessage, bytes]:
+        """
+        Sends a request on a pooled connection and reads the response. Returns the status, the headers and the body.
+        The access token is only sent to the Canvas instance, not e.g. to the file storage receiving the uploads.
+        Only idempotent requests are sent on idle connections: if the server has closed the connection,
+        the request is retried on another one. The other requests (e.g. creating a migration) are sent on a new
+        connection and never retried, since the server might have already processed them.
+        A streamed body is specified by a function creating it, so that it is only created when it is sent.
+        """
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        headers = dict(headers or {})
+        if key == urllib.parse.urlsplit(self.base_url)[:2]:
+            headers["Authorization"] = f"Bearer {self._token}"
+
+        while True:
+            connection, reused = self._acquire(key, reuse=method in _IDEMPOTENT_METHODS)
+            try:
+                connection.request(method, path, body() if callable(body) else body, headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused:
+                    _logger.debug("Connection to '%s' was closed by the server, reconnecting...", parts.netloc)
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                with self._lock:
+                    self._idle.setdefault(key, []).append(connection)
+            return response.status, response.headers, data
+
+    def _acquire(self, key: tuple[str, str], reuse: bool = True) -> tuple[http.client.HTTPConnection, bool]:
+        """
+        Takes an idle connection to the host (if reusing is allowed), or opens a new one.
+        Returns it and whether it was reused.
+        """
+        with self._lock:
+            if reuse and self._idle.get(key):
+                return self._idle[key].pop(), True
+        scheme, netloc = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self._timeout), False
+        if scheme == "http":
+            return http.client.HTTPConnection(netloc, timeout=self._timeout), False
+        raise ValueError(f"Unsupported URL scheme: '{scheme}'")
+
+
+def _multipart_envelope(boundary: str, fields: dict[str, str], file_param: str, file_name: str) -> tuple[bytes, bytes]:
+    """
+    Creates the parts of a multipart form preceding and following the contents of the file,
+    so that the file can be streamed. The upload parameters must precede the file.
+    """
+    head = "".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+        for name, value in fields.items()
+    )
+    head += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_param}"; filename="{file_name}"\r\n'
+        "Content-Type: application/zip\r\n\r\n"
+    )
+    return head.encode("utf-8"), f"\r\n--{boundary}--\r\n".encode()
+
+
+def _excerpt(data: bytes) -> str:
+    """The beginning of a response body, for error messages."""
+    text = data.decode("utf-8", "replace").strip()
+    return text if len(text) <= 200 else f"{text[:200]}..."
@@ -7,6 +7,28 @@ https://raw.githubusercontent.com/backyardbiomech/qtiConverter/09ebbb9bd433c18a3
 Modificications:
 - Formatted code
 - Changed re.sub('BACKSLASH ...') to re.sub(r'BACKSLASH ...') in two places to fix a SyntaxWarning
+- Removed the ElementTree parse and re-serialize pass (and the indent function) at the end of makeQti.run:
+  the generated XML is written as-is, optionally checked by a streaming well-formedness validator,
+  so the names, identifiers and paths taken from the input are escaped where they are inserted into the XML
+- Made the HTML preview optional and paginated, it is written by previewWriter while the questions are processed
+- Finished parseNU (negative numbers are also accepted) and stripped the whitespace around parseSA answers
+- makeQti.run accepts already loaded question blocks and writes the package straight into the zip file
+  (instead of a temporary folder), the main xml file is compressed on a separate thread by zipEntryWriter
+- Added a reproducible mode: identifiers derived from the bank name and the questions (stableId),
+  fixed zip entry timestamps (reproducibleDateTime) and file modes, images added in a sorted order
+- Implemented the report TODO of makeQti.run: statistics are collected while the questions are processed,
+  makeQti.report returns them
+- Moved the parsing of the questions from makeQti to questionConverter: convertQuestion converts the text
+  of a question to a questionFragment without shared state, makeQti only assembles the package (in order),
+  optionally converting the questions in multiple processes; the output folder can be specified
+- Replaced the regex passes over the whole file in makeQti.loadBank with normalizeLines, which processes the file
+  line by line and yields the question blocks as they are read
+- Made the host of the equation images configurable (it was hard-coded), the html of each equation is cached
+  and lines without $$ are skipped without a regex search
+- The memory usage of the stages of makeQti.run can be measured by a profiler, if one is specified
+- A bank can be converted in parts (e.g. on multiple machines): makeQti.writePart writes the converted questions
+  to a part file instead of a package (numbered from firstNumber), makeQti.run assembles the fragments of the parts
+  read by loadPart, giving the items the identifiers they would have got if the bank was converted at once
 
 This file is licensed under GPLv3:
 https://raw.githubusercontent.com/backyardbiomech/qtiConverter/09ebbb9bd433c18a3c28fdb6069d34c93f77a134/LICENSE
@@ -47,32 +69,134 @@ brandon.e.jackson@gmail.com
 
 
 import argparse
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import gzip
+import hashlib
+import itertools
+import os
 from pathlib import Path
+import queue
 import shutil
 import zipfile
 import re
 import html
+import json
+import math
+import multiprocessing
 import re
+import threading
+import time
 import xml.etree.ElementTree as ET
+import xml.sax.saxutils as saxutils
 import subprocess
 import urllib.parse
 import sys
 
 
-def indent(elem, level=0):
-    i = "\n" + level * "	"
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = i + "  "
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-        for elem in elem:
-            indent(elem, level + 1)
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-    else:
-        if level and (not elem.tail or not elem.tail.strip()):
-            elem.tail = i
+# the Canvas instance rendering the equation images
+defaultEquationHost = "https://longwood.instructure.com"
+# an equation is the text between the first and the last $$ of a line
+equationPattern = re.compile(r"\$\$(.*)\$\$")
+
+
+def validateXml(zipPath, name):
+    # check that the zipped file is well-formed XML without building the whole document tree in memory
+    try:
+        with zipfile.ZipFile(str(zipPath)) as zf, zf.open(name) as f:
+            for event, elem in ET.iterparse(f, events=("end",)):
+                elem.clear()
+    except ET.ParseError as e:
+        raise ValueError("The generated file '{}' is not well-formed XML: {}".format(name, e)) from e
+
+
+def normalizeLines(lines):
+    # cleans up the lines of a question bank in a single pass, yielding the question blocks one by one
+    # (the lines might be a file opened in text mode, so that the bank is never fully loaded into memory)
+    # a finished block is only yielded once the next one begins, since any whitespace at the end of the bank is removed
+    block, finished = [], None
+    for line in lines:
+        # get rid of the newline, hidden spaces and tabs at the end of the line, then hidden spaces and tabs before it
+        line = line.rstrip("\n").rstrip(" ").rstrip("\t").lstrip(" \t")
+        # lines that begin with # are comments, they and blank lines separate the questions
+        if line and not line.startswith("#"):
+            if not block and finished is not None:
+                yield finished
+                finished = None
+            block.append(line)
+        elif block:
+            finished = "\n".join(block)
+            block = []
+    if block:
+        finished = "\n".join(block)
+    if finished is not None:
+        yield finished.rstrip()
+
+
+@functools.lru_cache(maxsize=4096)
+def equationHtml(eqtext, host):
+    # converts mathjax/Latex style formula text (without the surrounding $$) into a <p><img... of the following format
+    # &lt;p&gt;&lt;img class="equation_image" title="\frac{5}{2}" src="https://longwood.instructure.com/equation_images/%255Cfrac%257B5%257D%257B2%257D" alt="LaTeX: \frac{5}{2}" data-equation-content="\frac{5}{2}"&gt;&lt;/p&gt;
+    # the variants of a quiz usually share their formulas, so the result is cached
+    # need to convert symbols in equation to url symbols
+    neweq = urllib.parse.quote(eqtext)
+    # need to add the odd %25 to each encoded character
+    neweq = neweq.replace("%", "%25")
+    return f'</p><p><img class="equation_image" title="{eqtext}" src="{host}/equation_images/{neweq}" alt="LaTeX: {eqtext}" data-equation-content="{eqtext}"></p><p>'
+
+
+def stableId(*parts):
+    # an identifier in the format Canvas uses, derived from the specified strings
+    return "i" + hashlib.md5("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def reproducibleDateTime():
+    # the timestamp of the zip entries in reproducible mode: SOURCE_DATE_EPOCH if set, the earliest one zip supports otherwise
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch is None:
+        return (1980, 1, 1, 0, 0, 0)
+    return max(time.gmtime(int(epoch))[:6], (1980, 1, 1, 0, 0, 0))
+
+
+class zipEntryWriter:
+    # writes text to a compressed zip entry on a separate thread, so that the compression overlaps with producing the text
+    def __init__(self, zf, info, queueSize=256):
+        self.entry = zf.open(info, mode="w", force_zip64=True)
+        self.queue = queue.Queue(maxsize=queueSize)
+        self.error = None
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def work(self):
+        done = False
+        while not done:
+            # write everything that is already waiting in one go
+            texts = [self.queue.get()]
+            while len(texts) < self.queue.maxsize and not self.queue.empty():
+                texts.append(self.queue.get())
+            if None in texts:
+                done = True
+                texts = texts[: texts.index(None)]
+            # after an error, keep emptying the queue so that the producer doesn't get stuck
+            if self.error is None:
+                try:
+                    self.entry.write("".join(texts).encode("utf-8"))
+                except BaseException as e:
+                    self.error = e
+
+    def write(self, text):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(text)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.entry.close()
+        if self.error is not None:
+            raise self.error
 
 
 def errorNoImage(q):
@@ -106,25 +230,90 @@ def logDisplay():
         print(applescript)
 
 
+class previewWriter:
+    # writes the html preview of the questions, starting a new page after every pageSize questions (if specified)
+    def __init__(self, path, pageSize=None):
+        self.path = path
+        self.pageSize = pageSize
+        self.pageNumber = 0
+        self.pageQuestions = 0
+        self.file = None
+
+    def pagePath(self, pageNumber):
+        # the first page keeps the original name, the others get the page number as suffix
+        if pageNumber <= 1:
+            return self.path
+        return self.path.with_name("{}_{}{}".format(self.path.stem, pageNumber, self.path.suffix))
+
+    def newPage(self):
+        if self.file is not None:
+            self.file.write('<p><a href="{}">Next page</a></p>\n'.format(self.pagePath(self.pageNumber + 1).name))
+            self.file.close()
+        self.pageNumber += 1
+        self.pageQuestions = 0
+        self.file = self.pagePath(self.pageNumber).open("w", encoding="utf-8")
+        self.file.write("<p>This is just a preview!</n>\n")
+        if self.pageNumber > 1:
+            self.file.write('<p><a href="{}">Previous page</a></p>\n'.format(self.pagePath(self.pageNumber - 1).name))
+
+    def write(self, htmlText):
+        if self.file is None or (self.pageSize and self.pageQuestions >= self.pageSize):
+            self.newPage()
+        self.file.write(htmlText + "\n")
+        self.pageQuestions += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
 class makeQti:
-    def __init__(self, ifile, sep):
+    def __init__(
+        self,
+        ifile,
+        sep,
+        validate_xml=False,
+        preview=True,
+        preview_page_size=None,
+        reproducible=False,
+        workers=1,
+        outDir=None,
+        equationHost=None,
+        memoryProfiler=None,
+        firstNumber=1,
+    ):
         ifile = ifile.replace(r"\ ", " ")
         self.ifile = Path(ifile)
         # initialize variables
         # get path to folder containing text questions and images
         self.fpath = self.ifile.parent
         self.sep = sep
+        self.validate_xml = validate_xml
+        self.previewEnabled = preview
+        # the package only depends on the questions and the bank name in reproducible mode
+        self.reproducible = reproducible
+        # number of processes converting the questions, and the number of questions sent to a process at once
+        self.workers = workers
+        self.batchSize = 64
+        # the equation images are rendered by this Canvas instance
+        self.equationHost = (equationHost or defaultEquationHost).rstrip("/")
+        # measures the memory usage of the stages of run, if specified (see MemoryProfiler)
+        self.memoryProfiler = memoryProfiler
+        # the number of the first question, the questions of a part continue the numbering of the previous parts
+        self.firstNumber = firstNumber
         # make the outputfile and question bank name based on the input file
         self.bankName = str(self.ifile.name)[0:-4]
-        # make a new directory within the current to contain the new files
-        self.newDirPath = self.fpath / (self.bankName + "_export")
-        self.newDirPath.mkdir(exist_ok=True)
+        # the zip file and the preview are placed next to the input file, unless another folder is specified
+        outDir = self.fpath if outDir is None else Path(outDir)
+        # the name of the package, the zip file contains the new files
+        self.newDirPath = outDir / (self.bankName + "_export")
+        self.zipFile = self.newDirPath.with_suffix(".zip")
         # make a new html file for a preview, inside the parent folder, but outside the export folder
-        self.preview = self.fpath / (self.bankName + "_preview.html")
-        # self.newDirPath will contain images, imsmanifest.xml, and a folder that contains the main xml file
-        # make that folder
+        self.preview = outDir / (self.bankName + "_preview.html")
+        self.previewWriter = previewWriter(self.preview, preview_page_size)
+        # the package will contain images, imsmanifest.xml, and a folder that contains the main xml file
         self.newXmlPath = self.newDirPath / self.bankName
-        self.newXmlPath.mkdir(exist_ok=True)
         # set the path of the new text file
         self.outFile = self.newXmlPath / self.bankName
         self.outFile = self.outFile.with_suffix(".xml")
@@ -137,113 +326,367 @@ class makeQti:
         self.manHeader = ""
         self.manFooter = ""
         self.manMainText = ""
-        # initialize a blank list to hold all of the questions and answers from the file
-        self.data = []
         # XML identifiers, don't think these actually matter
-        self.assessID = "assessID"
-        # Initialize a list of question types
-        self.typeList = ["MC", "MA", "MT", "SA", "MD", "MB", "ES", "TX", "NU"]
-        self.typeDict = {
-            "MC": "multiple_choice_question",
-            "MA": "multiple_answers_question",
-            "SA": "short_answer_question",
-            "ES": "essay_question",
-            "MB": "fill_in_multiple_blanks_question",
-            "MD": "multiple_dropdowns_question",
-            "MT": "matching_question",
-            "NU": "numerical_question",
-            "TX": "text_only_question",
-        }
-        # Initialize a counting variable to count images
+        # but they are derived from the contents in reproducible mode, so that different banks don't share them
+        if self.reproducible:
+            self.assessID = stableId(self.bankName, "assessment")
+            self.manifestID = stableId(self.bankName, "manifest")
+        else:
+            self.assessID = "assessID"
+            self.manifestID = "i595177d21a726452731ea55437e4c4d4"
+        # number of times each question (by its hash) occurred, identical questions still get different identifiers
+        self.itemRefCounts = {}
+        # Initialize a counting variable to count images, and the image files to include in the package (by name)
         self.imNum = 0
-        self.writeText = ""
-
-    def run(self):
+        self.images = {}
+        # statistics for the report: number of questions of each type, and the numbers of the questions
+        # with no correct answer, MC questions changed to MA, questions with formatting problems
+        self.typeCounts = {}
+        self.noCorrectAnswer = []
+        self.changedToMA = []
+        self.formatErrors = []
+
+    def run(self, blocks=None, fragments=None):
+        # blocks: the question blocks (as yielded by normalizeLines), they are read from the input file if not specified
+        # fragments: the already converted questions (e.g. read from the parts of the bank by loadPart), if specified
         # make the header
         self.makeHeader()
         # make the footer
         self.makeFooter()
 
-        # open the output files and write the headers
-        with self.outFile.open("w") as f:
-            f.write(self.header + "\n")
-        with self.manFile.open("w") as f:
-            f.write(self.manHeader + "\n")
-        with self.preview.open("w") as f:
-            f.write("<p>This is just a preview!</n>\n")
-        # open the input file and read in the data to self.data
-        self.loadBank()
-        # parse the questions in a loop
-        for q in range(len(self.data)):
-            self.qPts = "1"
-            # advance the count and initialize things
-            self.qNumber = q + 1
-            self.htmlText = ""
-            # parse the questions and answers based on new lines
-            # make self.fullText as a list, each item is a line from the question in the text file
-            self.fullText = self.data[q].split("\n")
-            # delete any blank lines in fullText (should only happen on the last question)
-            self.fullText = [x for x in self.fullText if len(x) > 0]
-            # before escaping html characters, need to process any formulas
-            self.fullText = self.processEquations(self.fullText)
-            # replace characters with html appropriate characters
-            # self.fullText = [html.escape(x) for x in self.fullText]
-            # process the question header
-            # sets self.imagePath, self.qPts, self.questionType, and calls self.processImage if needed to copy image to resources dir
-            self.qHeader()
-
-            # get the question type and parse it
-            # print(q)
-            # print(self.questionType)
-            try:
-                self.typeChooser()
-            except:
-                errorDisplay(self.qNumber, self.fullText)
-            # write the question and answers to the file
-            with self.outFile.open(mode="a", encoding="utf-8") as f:
-                f.write(self.writeText + "\n")
-            with self.preview.open(mode="a", encoding="utf-8") as f:
-                f.write(self.htmlText + "\n")
-        with self.outFile.open("a") as f:
-            f.write(self.footer)
-        with self.manFile.open("a") as f:
-            f.write(self.manFooter)
-
-        # import with xml parser, clean up, export
-
-        ET.register_namespace("", "http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1")
-        tree = ET.parse(str(self.manFile))
-        root = tree.getroot()
-        indent(root)
-        # mydata = ET.tostring(root, encoding='utf8').decode('utf8')
-        mydata = ET.tostring(root).decode()
-        myfile = open(str(self.manFile), "w")
-        myfile.write(mydata)
-        myfile.close()
-
-        ET.register_namespace("", "http://www.imsglobal.org/xsd/ims_qtiasiv1p2")
-        tree = ET.parse(str(self.outFile))
-        root = tree.getroot()
-        # mydata = ET.tostring(root, encoding='utf8').decode('utf8')
-        mydata = ET.tostring(root).decode()
-        myfile = open(str(self.outFile), "w")
-        myfile.write(mydata)
-        myfile.close()
-
-        # compress the folder
-        shutil.make_archive(str(self.newDirPath), "zip", str(self.newDirPath))
-        # remove the now compressed folder
-        shutil.rmtree(str(self.newDirPath))
-        # TODO:
-        """
-			generate a report that shows:
-				the number of questions of each type
-				the number of images (and a list of those images?)
-				the number (and numbers of) of questions with no correct answer indicated
-				if any MC questions had more than one correct answer and should be changed to MA
-				
+        if self.previewEnabled:
+            self.previewWriter.newPage()
+        if fragments is not None:
+            fragments = map(self.adoptFragment, fragments)
+        else:
+            if blocks is None:
+                # the input file is read while the questions are processed
+                blocks = self.loadBank()
+            fragments = self.convertBlocks(blocks)
+        xmlName = self.outFile.relative_to(self.newDirPath).as_posix()
+        manName = self.manFile.relative_to(self.newDirPath).as_posix()
+        with zipfile.ZipFile(str(self.zipFile), "w", zipfile.ZIP_DEFLATED) as zf:
+            with self.stage("questions"):
+                writer = zipEntryWriter(zf, self.zipInfo(xmlName))
+                try:
+                    writer.write(self.header + "\n")
+                    for fragment in fragments:
+                        self.addFragment(fragment, writer)
+                    writer.write(self.footer)
+                finally:
+                    writer.close()
+                self.previewWriter.close()
+            with self.stage("manifest and images"):
+                zf.writestr(self.zipInfo(manName), self.manHeader + "\n" + self.manMainText + self.manFooter)
+                for name, image in sorted(self.images.items()):
+                    with image.open("rb") as src, zf.open(self.zipInfo(name), "w") as dst:
+                        shutil.copyfileobj(src, dst)
+
+        # the files are already valid XML, only check them if requested
+        if self.validate_xml:
+            with self.stage("xml validation"):
+                validateXml(self.zipFile, manName)
+                validateXml(self.zipFile, xmlName)
+
+    def stage(self, name):
+        # a context measuring the memory usage of a stage of run, if there is a profiler
+        if self.memoryProfiler is None:
+            return contextlib.nullcontext()
+        return self.memoryProfiler.stage("{}: {}".format(self.bankName, name))
+
+    def report(self):
+        # the statistics collected by run
+        return {
+            "questions": sum(self.typeCounts.values()),
+            "question_types": dict(self.typeCounts),
+            "images": sorted(self.images),
+            "no_correct_answer": list(self.noCorrectAnswer),
+            "changed_to_ma": list(self.changedToMA),
+            "format_errors": list(self.formatErrors),
+        }
+
+    def zipInfo(self, name):
+        # the entries of reproducible packages have a fixed timestamp and file mode
+        if self.reproducible:
+            dateTime = reproducibleDateTime()
+        else:
+            dateTime = time.localtime()[:6]
+        info = zipfile.ZipInfo(name, date_time=dateTime)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        return info
+
+    def writePart(self, blocks, partFile, header):
+        # converts the questions like run, but writes the fragments to a part file (gzipped json lines) instead of
+        # a package, so that the parts of a bank can be converted separately, then assembled by run (see loadPart)
+        # header: a json object describing the part, written as the first line
+        # the hashes of the blocks are kept, so that the items can get their final identifiers when assembled
+        hashes = collections.deque()
+
+        def hashedBlocks():
+            for block in blocks:
+                hashes.append(hashlib.sha256(block.encode("utf-8")).hexdigest())
+                yield block
+
+        with gzip.open(partFile, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            for fragment in self.convertBlocks(hashedBlocks()):
+                fragment.blockHash = hashes.popleft()
+                self.countFragment(fragment)
+                for imgpath in fragment.images:
+                    self.images[Path(imgpath).name] = self.fpath / imgpath
+                f.write(json.dumps(fragment.toDict()) + "\n")
+
+    def convertBlocks(self, blocks):
+        # the questions are converted by convertQuestion (possibly concurrently), the fragments are yielded in order
+        # the arguments of convertQuestion for each question, computed in order, since the identifiers depend on it
+        jobs = (
+            (block, q, self.sep, self.fpath, self.nextItemRef(block), self.previewEnabled, self.equationHost)
+            for q, block in enumerate(blocks, self.firstNumber)
+        )
+        if self.workers <= 1:
+            for job in jobs:
+                yield convertQuestion(*job)
+            return
+        # convert batches of questions in separate processes, while only keeping a few batches in flight,
+        # so that the blocks are still consumed lazily
+        # the processes are spawned instead of forked, since other threads might hold locks at this point
+        spawn = multiprocessing.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=spawn) as executor:
+            pending = collections.deque()
+            while True:
+                batch = list(itertools.islice(jobs, self.batchSize))
+                if batch:
+                    pending.append(executor.submit(convertQuestions, batch))
+                if pending and (not batch or len(pending) >= 2 * self.workers):
+                    yield from pending.popleft().result()
+                elif not batch:
+                    break
+
+    def nextItemRef(self, block):
+        # the assessment_question_identifierref of the next question
+        if not self.reproducible:
+            return "i29529708ad95a6ff171e20abdfa2a8d9"
+        return self.itemRefForHash(hashlib.sha256(block.encode("utf-8")).hexdigest())
+
+    def itemRefForHash(self, blockHash):
+        # the next reproducible identifier of the question with the specified hash
+        self.itemRefCounts[blockHash] = self.itemRefCounts.get(blockHash, 0) + 1
+        return stableId(self.bankName, blockHash, str(self.itemRefCounts[blockHash]))
+
+    def adoptFragment(self, fragment):
+        # a fragment converted as a part of the bank only knew the questions of its part,
+        # its item gets the identifier it would have got if the bank was converted at once
+        if self.reproducible and fragment.blockHash is not None:
+            itemRef = self.itemRefForHash(fragment.blockHash)
+            fragment.xml = fragment.xml.replace(fragment.itemRef, itemRef, 1)
+            fragment.itemRef = itemRef
+        return fragment
+
+    def addFragment(self, fragment, writer):
+        # add the images to the package and the manifest file
+        # the images of a part are next to its part file, the others next to the text file
+        for imgpath in fragment.images:
+            self.imNum += 1
+            imgPath = (self.fpath if fragment.imageDir is None else fragment.imageDir) / imgpath
+            self.images[imgPath.name] = imgPath
+            self.addResMan(imgpath)
+        self.countFragment(fragment)
+        # write the question and answers to the file
+        writer.write(fragment.xml + "\n")
+        if self.previewEnabled:
+            self.previewWriter.write(fragment.html)
+
+    def countFragment(self, fragment):
+        # update the statistics, parseMC might have changed the question type
+        self.typeCounts[fragment.questionType] = self.typeCounts.get(fragment.questionType, 0) + 1
+        if fragment.noCorrectAnswer:
+            self.noCorrectAnswer.append(fragment.number)
+        if fragment.changedToMA:
+            self.changedToMA.append(fragment.number)
+        if fragment.formatError:
+            self.formatErrors.append(fragment.number)
+
+    def loadBank(self):
+        # yields the question blocks of the input file, which is read line by line
+        with self.ifile.open(mode="r", encoding="utf-8-sig") as f:
+            yield from normalizeLines(f)
+
+    def addResMan(self, img):
+        out1 = """<resource identifier="{}" type="webcontent" href={}>
+			<file href={}/>
+		</resource>
+			""".format("pic" + str(self.imNum), saxutils.quoteattr(img), saxutils.quoteattr(img))
+        # add to the manifest file, which is written at the end
+        self.manMainText += out1
+
+    def makeHeader(self):
+        # make the header for the main xml file
+        self.header = """<?xml version="1.0" encoding="UTF-8"?>
+<questestinterop xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.imsglobal.org/xsd/ims_qtiasiv1p2 http://www.imsglobal.org/xsd/ims_qtiasiv1p2p1.xsd">
+			  <assessment ident="{}" title={}>
+				<qtimetadata>
+				  <qtimetadatafield>
+					<fieldlabel>cc_maxattempts</fieldlabel>
+					<fieldentry>1</fieldentry>
+				  </qtimetadatafield>
+				</qtimetadata>
+				<section ident="root_section">
+			""".format(self.assessID, saxutils.quoteattr(self.bankName))
+
+        # make the header for the manifest file
+        self.manHeader = """<?xml version="1.0" encoding="UTF-8"?>
+<manifest identifier="{}" xmlns="http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1" xmlns:lom="http://ltsc.ieee.org/xsd/imsccv1p1/LOM/resource" xmlns:imsmd="http://www.imsglobal.org/xsd/imsmd_v1p2" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1 http://www.imsglobal.org/xsd/imscp_v1p1.xsd http://ltsc.ieee.org/xsd/imsccv1p1/LOM/resource http://www.imsglobal.org/profile/cc/ccv1p1/LOM/ccv1p1_lomresource_v1p0.xsd http://www.imsglobal.org/xsd/imsmd_v1p2 http://www.imsglobal.org/xsd/imsmd_v1p2p2.xsd">
+  <metadata>
+	<schema>IMS Content</schema>
+	<schemaversion>1.1.3</schemaversion>
+  </metadata>
+  <organizations/>
+  <resources>
+	<resource identifier={} type="imsqti_xmlv1p2">
+	  <file href={}/>
+	</resource>""".format(
+            self.manifestID,
+            saxutils.quoteattr(self.bankName),
+            saxutils.quoteattr(self.outFile.parent.name + "/" + self.outFile.name),
+        )
+
+    def makeFooter(self):
+        self.footer = """
+				</section>
+			  </assessment>
+			</questestinterop>
 			"""
 
+        self.manFooter = """</resources>
+</manifest>
+"""
+
+
+class questionFragment:
+    # the result of converting a single question: the xml item, its html preview and what the package needs to know
+    def __init__(
+        self,
+        number,
+        questionType,
+        xml,
+        html,
+        images,
+        noCorrectAnswer,
+        changedToMA,
+        formatError,
+        itemRef=None,
+        blockHash=None,
+        imageDir=None,
+    ):
+        self.number = number
+        self.questionType = questionType
+        self.xml = xml
+        self.html = html
+        # the paths of the images used by the question (relative to the folder of the text file), in order
+        self.images = images
+        self.noCorrectAnswer = noCorrectAnswer
+        self.changedToMA = changedToMA
+        self.formatError = formatError
+        # the assessment_question_identifierref of the item, and the hash of the question block (only known in parts)
+        self.itemRef = itemRef
+        self.blockHash = blockHash
+        # the folder the image paths are relative to, if not the folder of the text file (set for the parts)
+        self.imageDir = imageDir
+
+    def toDict(self):
+        # the json representation of the fragment in a part file, the image folder is implied by the part file
+        return {key: value for key, value in vars(self).items() if key != "imageDir"}
+
+
+def loadPartHeader(partFile):
+    # the json object written as the first line of a part file by makeQti.writePart
+    with gzip.open(partFile, "rt", encoding="utf-8") as f:
+        return json.loads(f.readline())
+
+
+def loadPart(partFile):
+    # yields the fragments of a part file written by makeQti.writePart, which is read line by line
+    with gzip.open(partFile, "rt", encoding="utf-8") as f:
+        f.readline()
+        for line in f:
+            yield questionFragment(**json.loads(line), imageDir=Path(partFile).parent)
+
+
+def convertQuestion(block, qNumber, sep, fpath, itemRef, preview=True, equationHost=defaultEquationHost):
+    # converts the text of a question to a questionFragment without touching any shared state,
+    # so that multiple questions can be converted concurrently (in threads or processes)
+    return questionConverter(block, qNumber, sep, fpath, itemRef, preview, equationHost).convert()
+
+
+def convertQuestions(jobs):
+    # converts a batch of questions, each job is the list of the arguments of convertQuestion
+    return [convertQuestion(*job) for job in jobs]
+
+
+class questionConverter:
+    # holds the state of converting a single question, an instance is only used once, by convertQuestion
+    typeList = ["MC", "MA", "MT", "SA", "MD", "MB", "ES", "TX", "NU"]
+    typeDict = {
+        "MC": "multiple_choice_question",
+        "MA": "multiple_answers_question",
+        "SA": "short_answer_question",
+        "ES": "essay_question",
+        "MB": "fill_in_multiple_blanks_question",
+        "MD": "multiple_dropdowns_question",
+        "MT": "matching_question",
+        "NU": "numerical_question",
+        "TX": "text_only_question",
+    }
+
+    def __init__(self, block, qNumber, sep, fpath, itemRef, preview=True, equationHost=defaultEquationHost):
+        self.block = block
+        self.qNumber = qNumber
+        self.sep = sep
+        self.fpath = fpath
+        self.itemRef = itemRef
+        self.previewEnabled = preview
+        self.equationHost = equationHost
+        self.qPts = "1"
+        self.htmlText = ""
+        self.writeText = ""
+        self.images = []
+        self.noCorrectAnswer = False
+        self.changedToMA = False
+        self.formatError = False
+
+    def convert(self):
+        # parse the questions and answers based on new lines
+        # make self.fullText as a list, each item is a line from the question in the text file
+        self.fullText = self.block.split("\n")
+        # delete any blank lines in fullText (should only happen on the last question)
+        self.fullText = [x for x in self.fullText if len(x) > 0]
+        # before escaping html characters, need to process any formulas
+        self.fullText = self.processEquations(self.fullText)
+        # replace characters with html appropriate characters
+        # self.fullText = [html.escape(x) for x in self.fullText]
+        # process the question header
+        # sets self.imagePath, self.qPts, self.questionType, and calls self.processImage if needed to record the image
+        self.qHeader()
+
+        # get the question type and parse it
+        try:
+            self.typeChooser()
+        except:
+            self.formatError = True
+            errorDisplay(self.qNumber, self.fullText)
+        return questionFragment(
+            self.qNumber,
+            self.questionType,
+            self.writeText,
+            self.htmlText,
+            self.images,
+            self.noCorrectAnswer,
+            self.changedToMA,
+            self.formatError,
+            self.itemRef,
+        )
+
     def qHeader(self):
         # search through question using regex to find anything before the question number self.fullText is a list with each item a new line of the text file
 
@@ -261,7 +704,7 @@ class makeQti:
         if self.questionType not in self.typeList:
             self.questionType = "MC"
         rws -= 1
-        # if it starts with image: that gives a link to the image, self.imagePath, advance self.imNum
+        # if it starts with image: that gives a link to the image, self.imagePath
         for i in range(3 - rws):
             im = re.findall(r"^\s*image:\s*(.*)$", self.fullText[i])
             if len(im) == 1:
@@ -282,16 +725,13 @@ class makeQti:
                 break
 
     def processImage(self, imgpath):
-        self.imNum += 1
         # get the full path to the image
         imgPath = self.fpath / imgpath
         # add error call if imagePath doesn't exist
         if not imgPath.exists():
             errorNoImage(self.qNumber)
-        # copy the image file
-        shutil.copy(str(imgPath), str(self.newDirPath))
-        # add the info to the manifest file
-        self.addResMan(imgpath)
+        # the image is added to the package (and the manifest file) by makeQti
+        self.images.append(imgpath)
 
     def typeChooser(self):
         """
@@ -374,20 +814,20 @@ class makeQti:
         # generate the responses
         questionTextResponse = ""
         for leftID, leftData in leftAns.items():
-            questionTextResponse += """<response_lid ident="{}">
+            questionTextResponse += """<response_lid ident={}>
 				<material>
 				  <mattext texttype="text/html">{}</mattext>
 				</material>
 				<render_choice>
-					""".format(leftID, leftData["text"])
+					""".format(saxutils.quoteattr(leftID), leftData["text"])
             # loop through right side answers
             for rightID, rightData in rightAns.items():
-                questionTextResponse += """<response_label ident="{}">
+                questionTextResponse += """<response_label ident={}>
 						<material>
 						  <mattext>{}</mattext>
 						</material>
 					  </response_label>
-					""".format(rightID, rightData["text"])
+					""".format(saxutils.quoteattr(rightID), rightData["text"])
             # close off that left side response
             questionTextResponse += """</render_choice>
 										</response_lid>
@@ -405,11 +845,11 @@ class makeQti:
             corrRespId = leftData["corr"]
             questionTextResponse += """<respcondition>
 					<conditionvar>
-					  <varequal respident="{}">{}</varequal>
+					  <varequal respident={}>{}</varequal>
 					</conditionvar>
 					<setvar varname="SCORE" action="Add">{}</setvar>
 				  </respcondition>
-					""".format(leftAns, corrRespId, perLeft)
+					""".format(saxutils.quoteattr(leftAns), saxutils.escape(corrRespId), perLeft)
         # close it out
         questionTextResponse += """</resprocessing>
 									  </item>"""
@@ -451,18 +891,20 @@ class makeQti:
                 dropAns[line[0]]["corr"] = respID
 
             dropAns[line[0]][respID] = self.processFormatting(line[1])
+        if any("corr" not in resp for resp in dropAns.values()):
+            self.noCorrectAnswer = True
         # generate the responses
         questionTextResponse = ""
         # loop back through dropAns dict to make the answers
 
         for dropName, resp in dropAns.items():
             # parse the first part fo the responses
-            questionTextResponse += """<response_lid ident="{}">
+            questionTextResponse += """<response_lid ident={}>
 												<material>
 												  <mattext>{}</mattext>
 												</material>
 												<render_choice>
-													""".format("response_" + dropName, dropName)
+													""".format(saxutils.quoteattr("response_" + dropName), saxutils.escape(dropName))
             # loop through responses for that drop
             for respID, respText in resp.items():
                 # if the item is a response (and not the correct indicator)
@@ -491,11 +933,11 @@ class makeQti:
             corrRespID = dropAns[dropName]["corr"]
             questionTextResponse += """<respcondition>
 											<conditionvar>
-											  <varequal respident="{}">{}</varequal>
+											  <varequal respident={}>{}</varequal>
 											</conditionvar>
 											<setvar varname="SCORE" action="Add">{}</setvar>
 										  </respcondition>
-				""".format("response_" + dropName, corrRespID, perDrop)
+				""".format(saxutils.quoteattr("response_" + dropName), corrRespID, perDrop)
         # close it out
         questionTextResponse += """</resprocessing>
 									  </item>"""
@@ -536,14 +978,16 @@ class makeQti:
             ans = [self.processFormatting(x) for x in ans]
             # put into dict
             blankCorr[bName] = ans
+        if not blankCorr:
+            self.noCorrectAnswer = True
         questionTextResponse = ""
         for blank, ans in blankCorr.items():
-            questionTextResponse += """<response_lid ident="{}">
+            questionTextResponse += """<response_lid ident={}>
 										<material>
 											<mattext>{}</mattext>
 										</material>
 										<render_choice>
-										""".format(blank, blank)
+										""".format(saxutils.quoteattr(blank), saxutils.escape(blank))
             for i in range(len(ans)):
                 resID = "resp" + str(i)
                 questionTextResponse += """<response_label ident="{}">
@@ -567,11 +1011,11 @@ class makeQti:
         for blank, ans in blankCorr.items():
             questionTextResponse += """<respcondition>
 										<conditionvar>
-											<varequal respident="{}">{}</varequal>
+											<varequal respident={}>{}</varequal>
 										</conditionvar>
 										<setvar varname="SCORE" action="Add">{}</setvar>
 									</respcondition>
-				""".format(blank, "resp0", perBlank)
+				""".format(saxutils.quoteattr(blank), "resp0", perBlank)
         questionTextResponse += """</resprocessing>
 						</item>
 						"""
@@ -631,8 +1075,10 @@ class makeQti:
         corr = []
         # make a list of correct answers
         for a in range(1, len(self.fullText)):
-            answer = self.processFormatting(self.fullText[a].split(self.sep, 1)[1])
+            answer = self.processFormatting(self.fullText[a].split(self.sep, 1)[1].strip())
             corr.append(answer)
+        if not corr:
+            self.noCorrectAnswer = True
         # make an identifier for the question
         itid = str(self.questionType) + str(self.qNumber)
         # build the question text
@@ -680,9 +1126,75 @@ class makeQti:
         quest = qmatch.group(1)
         # regex to find lines beginning with ans: then a digit, then maybe something in parentheses. Will use findall
         # for each match, group 1 is the answer, group 3 is the info in parentheses (if it exists) not inclusive of the parentheses. Can split on ","
-        areg = re.compile(r"^ans:\s{0,4}([\d|\,|\.]+)(\s{0,4}\((.+)\))?", re.M)
+        areg = re.compile(r"^ans:\s{0,4}(-?[\d|\,|\.]+)(\s{0,4}\((.+)\))?", re.M)
         ansmatch = re.finditer(areg, fulltext)
+        # each answer is (exact, min, max), min and max are None if only the exact answer is accepted
         answers = []
+        for mat in ansmatch:
+            exact = mat.group(1).replace(",", "")
+            if mat.group(3) is None:
+                answers.append((exact, None, None))
+            elif "," in mat.group(3):
+                low, high = [x.strip() for x in mat.group(3).split(",", 1)]
+                answers.append((exact, low, high))
+            else:
+                # number of significant digits: accept everything that rounds to the exact answer
+                value = float(exact)
+                digits = int(mat.group(3).strip())
+                magnitude = math.floor(math.log10(abs(value))) if value != 0 else 0
+                rounded = round(value, digits - 1 - magnitude)
+                half = 10 ** (magnitude - digits + 1) / 2
+                low = "{:.{}g}".format(rounded - half, digits + 1)
+                high = "{:.{}g}".format(rounded + half, digits + 1)
+                answers.append((exact, low, high))
+        if not answers:
+            self.noCorrectAnswer = True
+        quest = self.processFormatting(quest)
+        # make an identifier for the question
+        itid = str(self.questionType) + str(self.qNumber)
+        # build the question text
+        questionTextStart = self.questionText(quest, itid)
+        questionTextResponse = """<response_str ident="response1" rcardinality="Single">
+									<render_fib fibtype="Decimal">
+										<response_label ident="answer1"/>
+									</render_fib>
+								</response_str>
+							</presentation>
+							<resprocessing>
+								<outcomes>
+									<decvar maxvalue="100" minvalue="0" varname="SCORE" vartype="Decimal"/>
+								</outcomes>
+								"""
+        for exact, low, high in answers:
+            questionTextResponse += """<respcondition continue="No">
+									<conditionvar>
+										<or>
+											<varequal respident="response1">{}</varequal>
+											""".format(saxutils.escape(exact))
+            if low is not None:
+                questionTextResponse += """<and>
+												<vargte respident="response1">{}</vargte>
+												<varlte respident="response1">{}</varlte>
+											</and>
+											""".format(saxutils.escape(low), saxutils.escape(high))
+            questionTextResponse += """</or>
+									</conditionvar>
+									<setvar action="Set" varname="SCORE">100</setvar>
+								</respcondition>
+								"""
+        questionTextResponse += """</resprocessing>
+						</item>
+						"""
+        self.writeText = questionTextStart + questionTextResponse
+        # reformat answers to make html preview
+        previewAnswers = []
+        for exact, low, high in answers:
+            if low is None:
+                previewAnswers.append(exact)
+            else:
+                previewAnswers.append("{} ({} - {})".format(exact, low, high))
+        corr = []
+        self.htmlText = self.questionTextHtml(itid, quest, previewAnswers, corr)
 
     def parseMC(self):
         # quest = self.fullText[0].split(self.sep, 1)[1].strip()
@@ -712,7 +1224,11 @@ class makeQti:
             answer = self.processFormatting(mat.group(4))
             answers.append(answer)
             a += 1
+        if len(corr) == 0:
+            self.noCorrectAnswer = True
         if len(corr) > 1:
+            if self.questionType == "MC":
+                self.changedToMA = True
             self.questionType = "MA"
         quest = self.processFormatting(quest)
         # print(self.questionType)
@@ -728,6 +1244,9 @@ class makeQti:
         self.htmlText = self.questionTextHtml(itid, quest, answers, corr)
 
     def questionTextHtml(self, itid, quest, answers, corr):
+        # don't bother building the html if it isn't written anywhere
+        if not self.previewEnabled:
+            return ""
         if len(self.imagePath) > 0:
             quest = '<img src="{}" style="max-width: 100%; height: 500px" /><p>{}</>'.format(
                 self.imagePath, html.unescape(quest)
@@ -774,7 +1293,7 @@ class makeQti:
                 self.respImagePath = im[0]
                 self.processImage(self.respImagePath)
                 answers[a] = """&lt;img src="%24IMS-CC-FILEBASE%24/{}" style="max-width: 100%; height: 500px" /&gt;
-					""".format(self.respImagePath)
+					""".format(saxutils.escape(html.escape(self.respImagePath)))
 
             # make a string to track which answer is which
             resp = str(a + 1)
@@ -830,26 +1349,18 @@ class makeQti:
         # recieves a question block (a list of lines)
         # go through each line looking for $$...$$
         for i in range(len(fullData)):
-            if re.search(r"\$\$.*\$\$", fullData[i], re.M) is not None:
+            # most lines contain no equations, which is cheaper to check without a regex
+            if "$$" in fullData[i] and equationPattern.search(fullData[i]) is not None:
                 # replace > and < with mathjax codes
                 fullData[i] = fullData[i].replace("<", r"\lt")
                 fullData[i] = fullData[i].replace(">", r"\gt")
-                fullData[i] = re.sub(r"\$\$(.*)\$\$", self.processEquation, fullData[i], re.M)
+                fullData[i] = equationPattern.sub(self.processEquation, fullData[i])
         return fullData
 
     def processEquation(self, eq):
         # receives mathjax/Latex style formula text with surrounding $$
-        # returns only the html conversion of the equation
-        # converts the equation into a <p><img... of the following format
-        # &lt;p&gt;&lt;img class="equation_image" title="\frac{5}{2}" src="https://longwood.instructure.com/equation_images/%255Cfrac%257B5%257D%257B2%257D" alt="LaTeX: \frac{5}{2}" data-equation-content="\frac{5}{2}"&gt;&lt;/p&gt;
-        # use regex to extract info between $$
-        eqtext = eq.group(1)
-        # need to convert symbols in equation to url symbols
-        neweq = urllib.parse.quote(eqtext)
-        # need to add the odd %25 to each encoded character
-        neweq = neweq.replace("%", "%25")
-        eqret = f'</p><p><img class="equation_image" title="{eqtext}" src="https://longwood.instructure.com/equation_images/{neweq}" alt="LaTeX: {eqtext}" data-equation-content="{eqtext}"></p><p>'
-        return eqret
+        # returns only the html conversion of the equation (see equationHtml)
+        return equationHtml(eq.group(1), self.equationHost)
 
     def questionText(self, quest, itid):
         # build the text for each question, starting with a question "header"
@@ -857,7 +1368,7 @@ class makeQti:
         if len(self.imagePath) > 0:
             quest = """&lt;img src="%24IMS-CC-FILEBASE%24/{}" style="max-width: 100%; height: 500px" /&gt;
 				&lt;p&gt;{}&lt;/p&gt;
-				""".format(self.imagePath, quest)
+				""".format(saxutils.escape(html.escape(self.imagePath)), quest)
 
         out1 = """
 			<item ident="{}" title="Question">
@@ -873,7 +1384,7 @@ class makeQti:
 					</qtimetadatafield>
 					<qtimetadatafield>
 					  <fieldlabel>assessment_question_identifierref</fieldlabel>
-					  <fieldentry>i29529708ad95a6ff171e20abdfa2a8d9</fieldentry>
+					  <fieldentry>{}</fieldentry>
 					</qtimetadatafield>
 				  </qtimetadata>
 				</itemmetadata>
@@ -881,71 +1392,9 @@ class makeQti:
 				  <material>
 					  <mattext texttype="text/html">&lt;div&gt;&lt;p&gt;{}&lt;/p&gt;&lt;/div&gt;</mattext>
 				  </material>
-				  """.format(itid, self.typeDict[self.questionType], self.qPts, quest)
+				  """.format(itid, self.typeDict[self.questionType], self.qPts, self.itemRef, quest)
         return out1
 
-    def loadBank(self):
-        with self.ifile.open(mode="r", encoding="utf-8-sig") as f:
-            data = f.read()
-        # get rid of hidden spaces on new lines
-        data = re.sub(r"\ +\n", "\n", data.strip(), flags=re.MULTILINE)
-        # get rid of hidden tabs before new lines
-        data = re.sub("\t+\n", "\n", data.strip(), flags=re.MULTILINE)
-        # get rid of hidden spaces and tabsbefore lines
-        data = re.sub(r"^[\ \t]+", "", data.strip(), flags=re.MULTILINE)
-        # get rid of lines that begin with # as a comment indicator
-        data = re.sub("^#.*$", "", data.strip(), flags=re.MULTILINE)
-        # combine multiple new lines into just the needed two
-        data = re.sub("\n{3,100}", "\n\n", data.strip(), flags=re.MULTILINE)
-        self.data = data.split("\n\n")
-
-    def addResMan(self, img):
-        out1 = """<resource identifier="{}" type="webcontent" href="{}">
-			<file href="{}"/>
-		</resource>
-			""".format("pic" + str(self.imNum), img, img)
-        # write to the manifest file
-        with self.manFile.open(mode="a", encoding="utf-8") as f:
-            f.write(out1)
-
-    def makeHeader(self):
-        # make the header for the main xml file
-        self.header = """<?xml version="1.0" encoding="UTF-8"?>
-<questestinterop xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.imsglobal.org/xsd/ims_qtiasiv1p2 http://www.imsglobal.org/xsd/ims_qtiasiv1p2p1.xsd">
-			  <assessment ident="{}" title="{}">
-				<qtimetadata>
-				  <qtimetadatafield>
-					<fieldlabel>cc_maxattempts</fieldlabel>
-					<fieldentry>1</fieldentry>
-				  </qtimetadatafield>
-				</qtimetadata>
-				<section ident="root_section">
-			""".format(self.assessID, self.bankName)
-
-        # make the header for the manifest file
-        self.manHeader = """<?xml version="1.0" encoding="UTF-8"?>
-<manifest identifier="i595177d21a726452731ea55437e4c4d4" xmlns="http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1" xmlns:lom="http://ltsc.ieee.org/xsd/imsccv1p1/LOM/resource" xmlns:imsmd="http://www.imsglobal.org/xsd/imsmd_v1p2" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1 http://www.imsglobal.org/xsd/imscp_v1p1.xsd http://ltsc.ieee.org/xsd/imsccv1p1/LOM/resource http://www.imsglobal.org/profile/cc/ccv1p1/LOM/ccv1p1_lomresource_v1p0.xsd http://www.imsglobal.org/xsd/imsmd_v1p2 http://www.imsglobal.org/xsd/imsmd_v1p2p2.xsd">
-  <metadata>
-	<schema>IMS Content</schema>
-	<schemaversion>1.1.3</schemaversion>
-  </metadata>
-  <organizations/>
-  <resources>
-	<resource identifier="{}" type="imsqti_xmlv1p2">
-	  <file href="{}"/>
-	</resource>""".format(self.bankName, self.outFile.parent.name + "/" + self.outFile.name)
-
-    def makeFooter(self):
-        self.footer = """
-				</section>
-			  </assessment>
-			</questestinterop>
-			"""
-
-        self.manFooter = """</resources>
-</manifest>
-"""
-
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -957,10 +1406,38 @@ if __name__ == "__main__":
         default=".",
         help="string indicating separator between question/answer number/letter and text, usually '.' or ')'",
     )
+    parser.add_argument(
+        "--validate-xml", action="store_true", help="check that the generated XML files are well-formed"
+    )
+    parser.add_argument("--no-preview", action="store_true", help="don't generate the html preview file")
+    parser.add_argument(
+        "--preview-page-size", type=int, default=None, help="number of questions per html preview page"
+    )
+    parser.add_argument(
+        "--reproducible", action="store_true", help="generate the same zip file each time the input is the same"
+    )
+    parser.add_argument("--report", action="store_true", help="print a json report of the questions of each file")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes converting the questions")
+    parser.add_argument(
+        "--equation-host",
+        default=defaultEquationHost,
+        help="url of the Canvas instance rendering the equation images, e.g. https://canvas.instructure.com",
+    )
 
     args = parser.parse_args()
     for iFile in args.ifile:
         # inputFile=args.ifile
         sep = args.separator
-        doIt = makeQti(iFile, sep)
+        doIt = makeQti(
+            iFile,
+            sep,
+            validate_xml=args.validate_xml,
+            preview=not args.no_preview,
+            preview_page_size=args.preview_page_size,
+            reproducible=args.reproducible,
+            workers=args.workers,
+            equationHost=args.equation_host,
+        )
         doIt.run()
+        if args.report:
+            print(json.dumps({"file": iFile, **doIt.report()}))
@@ -0,0 +1,150 @@
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel
+
+from canvas_quiz_generator.index import IndexChanges
+
+
+class InputReport(BaseModel):
+    """Statistics of an input-config pair, collected while its quizzes are generated."""
+
+    input: Path
+    """Path to the quiz description."""
+
+    config: Path
+    """Path to the configuration file."""
+
+    quizzes: int = 0
+    """The number of generated quizzes."""
+
+    missing_placeholders: list[str] = []
+    """The placeholders of the config that do not occur in the quiz description."""
+
+    missing_answer_fields: list[str] = []
+    """The answer fields of the config that do not occur in the quiz description."""
+
+    minified_bytes: int = 0
+    """The number of bytes the HTML minification removed from the quiz description, and thus from each quiz."""
+
+
+class Diagnostic(BaseModel):
+    """A problem found while building a quiz bank. Identical problems of different quizzes are only recorded once."""
+
+    severity: Literal["warning", "error"]
+    """Errors make the affected quizzes unusable, warnings might be intentional."""
+
+    code: Literal["missing_placeholder", "missing_answer_field"]
+    """The kind of the problem."""
+
+    input: Path
+    """Path to the quiz description the problem was found in."""
+
+    key: str
+    """The placeholder or answer field the problem concerns."""
+
+    count: int = 0
+    """The number of quizzes affected by the problem."""
+
+
+class PackageReport(BaseModel):
+    """Statistics of a QTI package, collected while its questions are converted."""
+
+    path: Path
+    """Path to the QTI ZIP."""
+
+    bytes: int = 0
+    """The size of the QTI ZIP."""
+
+    questions: int = 0
+    """The number of questions within the package."""
+
+    question_types: dict[str, int] = {}
+    """Maps the question types to the number of questions of that type."""
+
+    images: list[str] = []
+    """The names of the images included in the package."""
+
+    no_correct_answer: list[int] = []
+    """The numbers (within the package, starting from 1) of the questions with no correct answer."""
+
+    changed_to_ma: list[int] = []
+    """The numbers of the MC questions with multiple correct answers, which were converted to MA questions."""
+
+    format_errors: list[int] = []
+    """The numbers of the questions that could not be converted due to formatting problems."""
+
+    seconds: float = 0
+    """The time it took to convert the package."""
+
+
+class MemoryStageReport(BaseModel):
+    """The memory usage of a stage of the build, measured via tracemalloc."""
+
+    name: str
+    """The name of the stage."""
+
+    peak_bytes: int
+    """The peak of the memory allocated by Python while the stage was running."""
+
+    retained_bytes: int
+    """The change of the allocated memory from the start of the stage to its end."""
+
+    top_sites: dict[str, int] = {}
+    """Maps the source lines (file:line) that retained the most memory during the stage to the retained bytes."""
+
+
+class BuildReport(BaseModel):
+    """
+    Statistics of a quiz bank build, collected while the bank is built.
+    The stages of the build overlap, therefore their timings do not add up to the total time.
+    """
+
+    bank_name: str
+    """The name of the quiz bank."""
+
+    quizzes: int = 0
+    """The number of generated quizzes."""
+
+    minified_bytes: int = 0
+    """The number of bytes the HTML minification removed from the quizzes, before they were escaped and compressed."""
+
+    question_types: dict[str, int] = {}
+    """Maps the question types to the number of questions of that type, across all packages."""
+
+    inputs: list[InputReport] = []
+    """The statistics of each input-config pair."""
+
+    packages: list[PackageReport] = []
+    """The statistics of each QTI package."""
+
+    changes: IndexChanges | None = None
+    """The changes since the previous build, if the quizzes were compared to its index."""
+
+    diagnostics: list[Diagnostic] = []
+    """The problems found while building the bank, deduplicated per input and key."""
+
+    timings: dict[str, float] = {}
+    """Maps the stages of the build to the time spent in them, in seconds."""
+
+    memory: list[MemoryStageReport] = []
+    """The memory usage of the stages of the build, if it was profiled."""
+
+    def add_diagnostic(
+        self,
+        severity: Literal["warning", "error"],
+        code: Literal["missing_placeholder", "missing_answer_field"],
+        input: Path,
+        key: str,
+        count: int,
+    ) -> None:
+        """Records a problem affecting the specified number of quizzes, adding the count to an identical problem."""
+        for diagnostic in self.diagnostics:
+            if (diagnostic.code, diagnostic.input, diagnostic.key) == (code, input, key):
+                diagnostic.count += count
+                return
+        self.diagnostics.append(Diagnostic(severity=severity, code=code, input=input, key=key, count=count))
+
+    def save(self, path: Path) -> None:
+        """Writes the report as JSON to the specified path."""
+        path.write_text(self.model_dump_json(indent=2), encoding="utf-8")
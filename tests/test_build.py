@@ -0,0 +1,134 @@
+import json
+from pathlib import Path
+from typing import Any
+import zipfile
+
+import pytest
+
+from canvas_quiz_generator.__main__ import execute_logic
+from canvas_quiz_generator.config import GeneratorConfig
+from canvas_quiz_generator.logic import merge_partial_banks
+from canvas_quiz_generator.qtiConverterApp import validateXml
+
+
+def _write_input(directory: Path, name: str, description: str, variants: list[dict[str, Any]]) -> tuple[Path, Path]:
+    """Writes a quiz description and its config. Returns their paths."""
+    directory.mkdir(parents=True, exist_ok=True)
+    input, config = directory / f"{name}.txt", directory / f"{name}.json"
+    input.write_text(description)
+    config.write_text(json.dumps({"variants": variants}))
+    return input, config
+
+
+def _build(output_dir: Path, inputs: list[tuple[Path, Path]], **options: Any) -> list[Path]:
+    """Builds a quiz bank from the input-config pairs. Returns the paths of the packages."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    pairs = [(input, (GeneratorConfig.load_from_json(config), config)) for input, config in inputs]
+    return execute_logic(pairs, output_dir, "quiz_bank", **options)
+
+
+def _validate_package(package: Path) -> None:
+    """Checks that all XML files of the package are well-formed."""
+    with zipfile.ZipFile(package) as zf:
+        names = [name for name in zf.namelist() if name.endswith(".xml")]
+    assert len(names) == 2
+    for name in names:
+        validateXml(package, name)
+
+
+def test_special_characters_are_escaped(tmp_path: Path) -> None:
+    variants = [{"placeholders": {"[[X]]": "<i>"}, "answer_fields": {"A&B": "x < y"}}]
+    input = _write_input(tmp_path / "inputs", "task", "Fill [A&B] here, [[X]]", variants)
+    (package,) = _build(tmp_path / "output", [input])
+
+    _validate_package(package)
+    with zipfile.ZipFile(package) as zf:
+        xml = zf.read("quiz_bank/quiz_bank.xml").decode("utf-8")
+    assert '<response_lid ident="A&amp;B">' in xml
+    assert '<varequal respident="A&amp;B">resp0</varequal>' in xml
+
+
+def _example_inputs(directory: Path, count: int) -> list[tuple[Path, Path]]:
+    """Writes two quiz descriptions with the specified number of variants each."""
+    variants = [{"placeholders": {"[[X]]": str(i)}, "answer_fields": {"A": str(i * i)}} for i in range(count)]
+    return [
+        _write_input(directory, "first", "What is [[X]] squared? [A]", variants),
+        _write_input(directory, "second", "**Square** [[X]]: [A]\n\n```\ncode [[X]]\n```", variants),
+    ]
+
+
+def test_sharded_build_matches_full_build(tmp_path: Path) -> None:
+    inputs = _example_inputs(tmp_path / "inputs", 5)
+    (package,) = _build(tmp_path / "full", inputs, reproducible=True)
+
+    part_files = []
+    for part in range(1, 4):
+        (part_file,) = _build(tmp_path / f"part_{part}", inputs, reproducible=True, shard=(part, 3))
+        part_files.append(part_file)
+    (tmp_path / "merged").mkdir()
+    merged = merge_partial_banks(reversed(part_files), tmp_path / "merged")
+
+    assert merged.questions == 10
+    assert merged.path.read_bytes() == package.read_bytes()
+
+
+def _quizzes(quiz_bank_txt: Path) -> list[str]:
+    """The text-format quizzes of a quiz bank generated from _example_inputs."""
+    return ["MB\n" + quiz for quiz in quiz_bank_txt.read_text(encoding="utf-8").split("MB\n")[1:]]
+
+
+def _package_questions(package: Path) -> int:
+    """Validates the package, then counts its questions."""
+    _validate_package(package)
+    name = package.name.removesuffix("_export.zip")
+    with zipfile.ZipFile(package) as zf:
+        # Each package is self-contained: its manifest is at the root and refers to its own questions
+        assert f'<file href="{name}/{name}.xml"/>' in zf.read("imsmanifest.xml").decode("utf-8")
+        return zf.read(f"{name}/{name}.xml").decode("utf-8").count("<item ")
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_split_packages_by_items(tmp_path: Path, jobs: int) -> None:
+    output_dir = tmp_path / "output"
+    packages = _build(output_dir, _example_inputs(tmp_path / "inputs", 5), max_items_per_package=4, jobs=jobs)
+
+    assert [package.name for package in packages] == [f"quiz_bank_{i}_export.zip" for i in range(1, 4)]
+    assert [_package_questions(package) for package in packages] == [4, 4, 2]
+    assert [len(_quizzes(output_dir / f"quiz_bank_{i}.txt")) for i in range(1, 4)] == [4, 4, 2]
+
+
+def test_split_packages_by_bytes(tmp_path: Path) -> None:
+    inputs = _example_inputs(tmp_path / "inputs", 5)
+    _build(tmp_path / "single", inputs)
+    all_quizzes = _quizzes(tmp_path / "single" / "quiz_bank.txt")
+    limit = 3 * len(all_quizzes[0])
+
+    packages = _build(tmp_path / "output", inputs, max_package_bytes=limit)
+    shards = [_quizzes(package.with_name(package.name.removesuffix("_export.zip") + ".txt")) for package in packages]
+    assert [quiz for shard in shards for quiz in shard] == all_quizzes
+    assert [_package_questions(package) for package in packages] == [len(shard) for shard in shards]
+    for shard, next_shard in zip(shards, shards[1:] + [None]):
+        shard_bytes = sum(len(quiz) for quiz in shard)
+        # Each package is filled until the next quiz would exceed the limit
+        assert shard_bytes <= limit or len(shard) == 1
+        if next_shard is not None:
+            assert shard_bytes + len(next_shard[0]) > limit
+    assert [len(shard) for shard in shards][:2] == [3, 2]
+
+
+@pytest.mark.parametrize("limits", [{}, {"max_items_per_package": 3}])
+def test_reproducible_builds_are_identical(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, limits: dict[str, int]
+) -> None:
+    inputs = _example_inputs(tmp_path / "inputs", 5)
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+    first = _build(tmp_path / "first", inputs, reproducible=True, **limits)
+    second = _build(tmp_path / "second", inputs, reproducible=True, jobs=2, **limits)
+
+    assert [package.name for package in first] == [package.name for package in second]
+    for package, other in zip(first, second):
+        assert package.read_bytes() == other.read_bytes()
+        checksum = package.with_name(f"{package.name}.sha256").read_text()
+        assert checksum == other.with_name(f"{other.name}.sha256").read_text()
+        with zipfile.ZipFile(package) as zf:
+            assert {info.date_time for info in zf.infolist()} == {(2023, 11, 14, 22, 13, 20)}
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+from pathlib import Path
+import random
+
+from pydantic import ValidationError
+import pytest
+
+from canvas_quiz_generator.config import GeneratorConfig, RangeConfig, VariantConfig
+
+
+EXAMPLE_CONFIG = Path(__file__).parent.parent / "example" / "config.json"
+
+
+def test_cached_config_matches_parsed_config(tmp_path: Path) -> None:
+    parsed = GeneratorConfig.load_from_json(EXAMPLE_CONFIG, tmp_path)
+    cached = GeneratorConfig.load_from_json(EXAMPLE_CONFIG, tmp_path)
+
+    assert len(cached.variants) == cached.count_variants() == parsed.count_variants() == 2
+    assert list(cached.variants) == list(cached.iter_variants()) == parsed.variants
+    assert cached.variants[-1] == parsed.variants[-1]
+    assert cached.variants[::-1] == parsed.variants[::-1]
+    assert cached.model_dump() == parsed.model_dump()
+
+
+def test_concurrent_cache_writes(tmp_path: Path) -> None:
+    # The threads of build-all may write the same cache entry at the same time
+    path, cache_dir = tmp_path / "config.json", tmp_path / "cache"
+    variants = [{"placeholders": {"[[X]]": str(i)}, "answer_fields": {"A": str(i)}} for i in range(5000)]
+    path.write_text(json.dumps({"variants": variants}))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        configs = list(executor.map(lambda _: GeneratorConfig.load_from_json(path, cache_dir), range(8)))
+
+    assert all(config.count_variants() == len(variants) for config in configs)
+    assert [path.suffix for path in cache_dir.iterdir()] == [".bin"]
+
+
+def test_failed_cache_write_is_not_fatal(tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+    cache_dir.write_text("not a directory")
+
+    config = GeneratorConfig.load_from_json(EXAMPLE_CONFIG, cache_dir)
+    assert config.count_variants() == 2
+
+
+@pytest.mark.parametrize("key", ["DROP-1", "drop 1", "[DROP1]", ""])
+def test_rejects_invalid_dropdown_names(key: str) -> None:
+    with pytest.raises(ValidationError, match="not a valid dropdown name"):
+        VariantConfig(question_type="MD", placeholders={}, answer_fields={key: "a"})
+
+
+def test_accepts_dropdown_names_with_word_characters() -> None:
+    variant = VariantConfig(question_type="MD", placeholders={}, answer_fields={"DROP_1": "a", "Ár": "b"})
+    assert list(variant.answer_fields) == ["DROP_1", "Ár"]
+
+
+@pytest.mark.parametrize(
+    "start, stop, step, values",
+    [
+        (0, 5, 1, [0, 1, 2, 3, 4]),
+        (5, 0, -2, [5, 3, 1]),
+        (0, 0, 1, []),
+        (1.0, 1.3, 0.1, [1.0, 1.1, 1.2]),
+        (0, 0.3, 0.1, [0, 0.1, 0.2]),
+        (0.3, 0, -0.1, [0.3, 0.2, 0.1]),
+        (0, 1, 0.25, [0, 0.25, 0.5, 0.75]),
+        (0, 0.35, 0.1, [0, 0.1, 0.2, 0.3]),
+    ],
+)
+def test_range_values_exclude_stop(start: float, stop: float, step: float, values: list[float]) -> None:
+    assert RangeConfig(start=start, stop=stop, step=step).values() == values
+
+
+def _sample_configs(directory: Path) -> list[Path]:
+    """Writes a config listing 20 variants and a config generating the same variants."""
+    listed, generated = directory / "listed.json", directory / "generated.json"
+    variants = [{"placeholders": {"[[N]]": str(n)}, "answer_fields": {"A": str(n * 2)}} for n in range(20)]
+    listed.write_text(json.dumps({"variants": variants}))
+    generator = {
+        "parameters": {"N": {"start": 0, "stop": 20}},
+        "variant": {"placeholders": {"[[N]]": "{N}"}, "answer_fields": {"A": "{N * 2}"}},
+    }
+    generated.write_text(json.dumps({"generator": generator}))
+    return [listed, generated]
+
+
+@pytest.mark.parametrize("config", ["listed", "generated"])
+def test_sample_is_deterministic(tmp_path: Path, config: str) -> None:
+    listed, generated = _sample_configs(tmp_path)
+    path = listed if config == "listed" else generated
+
+    sample = GeneratorConfig.load_sample_from_json(path, 5, random.Random(42)).variants
+    assert GeneratorConfig.load_sample_from_json(path, 5, random.Random(42)).variants == sample
+    assert len(sample) == 5
+    # The sampled variants keep their order
+    numbers = [int(variant.placeholders["[[N]]"]) for variant in sample]
+    assert numbers == sorted(set(numbers))
+    assert GeneratorConfig.load_sample_from_json(path, 5, random.Random(43)).variants != sample
+
+
+@pytest.mark.parametrize("sample_size", [20, 100])
+def test_sample_of_all_variants(tmp_path: Path, sample_size: int) -> None:
+    for path in _sample_configs(tmp_path):
+        config = GeneratorConfig.load_sample_from_json(path, sample_size, random.Random(1))
+        assert config.variants == list(GeneratorConfig.load_from_json(path).iter_variants())
+        assert config.count_variants() == 20
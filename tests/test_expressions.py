@@ -0,0 +1,37 @@
+import pytest
+
+from canvas_quiz_generator.expressions import Expression, Template
+
+
+@pytest.mark.parametrize(
+    "source, value",
+    [
+        ("N * len(FRUIT)", 15),
+        ("2 ** N", 8),
+        ("(-2) ** N", -8),
+        ("N ** -1", 1 / 3),
+        ("2.0 ** 0.5", 2.0**0.5),
+        ("1 << N", 8),
+        ("FRUIT * 2", "appleapple"),
+        ("N if N > 2 else -N", 3),
+    ],
+)
+def test_evaluate(source: str, value: object) -> None:
+    assert Expression(source, ["N", "FRUIT"]).evaluate({"N": 3, "FRUIT": "apple"}) == value
+
+
+@pytest.mark.parametrize("source", ["9 ** 9 ** 9", "N ** 10 ** 6", "1 << 10 ** 6", "FRUIT * 10 ** 9", "10 ** 9 * L"])
+def test_huge_values_are_rejected(source: str) -> None:
+    with pytest.raises(ValueError, match="too (large|long)"):
+        Expression(source, ["N", "FRUIT", "L"]).evaluate({"N": 3, "FRUIT": "apple", "L": [0]})
+
+
+@pytest.mark.parametrize("source", ["__import__('os')", "N.real", "open('x')", "[x for x in N]", "lambda: 0"])
+def test_unsupported_syntax_is_rejected(source: str) -> None:
+    with pytest.raises(ValueError):
+        Expression(source, ["N"])
+
+
+def test_template() -> None:
+    template = Template("{{N}} = {N ** 2:.1f}", ["N"])
+    assert template.render({"N": 3}) == "{N} = 9.0"
@@ -0,0 +1,69 @@
+from collections.abc import Iterator
+from pathlib import Path
+import threading
+
+import pytest
+
+from canvas_quiz_generator.logic import _prefetch, _split_shards, quiz_str_list_to_bank
+
+
+def _shards(quizzes: list[str], max_items: int | None, max_bytes: int | None) -> list[list[str]]:
+    return [
+        [b"".join(parts).decode("utf-8") for parts in shard] for shard in _split_shards(quizzes, max_items, max_bytes)
+    ]
+
+
+def test_split_shards_by_items() -> None:
+    quizzes = [f"quiz {i}\n\n" for i in range(5)]
+    assert _shards(quizzes, 2, None) == [quizzes[0:2], quizzes[2:4], quizzes[4:5]]
+    assert _shards(quizzes, 5, None) == [quizzes]
+
+
+def test_split_shards_by_bytes() -> None:
+    quizzes = ["a" * 4, "b" * 4, "c" * 9, "d" * 2, "e" * 2, "f" * 20]
+    # A shard is closed before the quiz that would exceed the limit, an oversized quiz gets its own shard
+    assert _shards(quizzes, None, 10) == [["aaaa", "bbbb"], ["c" * 9], ["dd", "ee"], ["f" * 20]]
+    assert _shards(quizzes, 2, 10) == [["aaaa", "bbbb"], ["c" * 9], ["dd", "ee"], ["f" * 20]]
+    # The bytes are counted after encoding
+    assert _shards(["é" * 3, "é" * 3], None, 10) == [["ééé"], ["ééé"]]
+
+
+def test_split_shards_without_quizzes() -> None:
+    assert _shards([], 2, None) == [[]]
+
+
+def _failing_quizzes(count: int) -> Iterator[str]:
+    for i in range(count):
+        yield f"MB\n1. Quiz {i} [A]\nA: {i}\n\n"
+    raise RuntimeError("rendering failed")
+
+
+def test_prefetch() -> None:
+    assert list(_prefetch(range(1000), 4)) == list(range(1000))
+
+
+def test_prefetch_reraises_in_consumer() -> None:
+    consumed = []
+    with pytest.raises(RuntimeError, match="rendering failed"):
+        for item in _prefetch(_failing_quizzes(10), 4):
+            consumed.append(item)
+    assert len(consumed) == 10
+
+
+def test_prefetch_stops_producer_when_consumer_stops() -> None:
+    produced = threading.Event()
+
+    def items() -> Iterator[int]:
+        yield from range(10)
+        produced.set()
+
+    iterator = _prefetch(items(), 2)
+    assert next(iterator) == 0
+    iterator.close()
+    # The producer thread was joined, without having to produce all items
+    assert not produced.is_set()
+
+
+def test_build_reraises_prefetch_error(tmp_path: Path) -> None:
+    with pytest.raises(RuntimeError, match="rendering failed"):
+        quiz_str_list_to_bank(_failing_quizzes(300), tmp_path, "quiz_bank", preview=False)
@@ -0,0 +1,82 @@
+import shutil
+import subprocess
+
+import pytest
+
+from canvas_quiz_generator.markdown import markdown_to_html
+
+
+# The expected outputs were captured from pandoc 3.9, invoked the same way as by the format conversion
+GOLDEN = [
+    ("paragraph", "Hello world", "<p>Hello world</p>\n"),
+    ("paragraphs", "Para one\n\nPara two\n", "<p>Para one</p>\n<p>Para two</p>\n"),
+    ("hard_line_break", "Line one  \nLine two", "<p>Line one<br />\nLine two</p>\n"),
+    ("soft_line_break", "Soft\nwrap", "<p>Soft wrap</p>\n"),
+    ("collapsed_spaces", "a  b   c", "<p>a b c</p>\n"),
+    ("inline_code", "Use `x < y && z` here", "<p>Use <code>x &lt; y &amp;&amp; z</code> here</p>\n"),
+    ("bold", "**bold** text", "<p><strong>bold</strong> text</p>\n"),
+    ("bold_across_lines", "a **bold\nacross** lines", "<p>a <strong>bold across</strong> lines</p>\n"),
+    ("apostrophe", "It's fine", "<p>It’s fine</p>\n"),
+    ("ampersand", "x & y", "<p>x &amp; y</p>\n"),
+    (
+        "fenced_code",
+        "Intro\n\n```\na < b && c > d \"q\" 'x'\n```\n",
+        "<p>Intro</p>\n<pre><code>a &lt; b &amp;&amp; c &gt; d &quot;q&quot; &#39;x&#39;</code></pre>\n",
+    ),
+    (
+        "fenced_code_tabs",
+        "Intro\n\n```\nif x:\n\treturn 1\n  \tz\ty\n```\n",
+        "<p>Intro</p>\n<pre><code>if x:\n    return 1\n    z   y</code></pre>\n",
+    ),
+    ("longer_fence", "````\n```\nnested\n````", "<pre><code>```\nnested</code></pre>\n"),
+    (
+        "quiz_description",
+        "This is a fruit: [[FRUIT]]  \nRun: `python3 example.py --key [[KEY]]`\n\n"
+        "Paste:  \nTest 1: [SUBTASK1]  \nTest 2: [SUBTASK2]\n",
+        "<p>This is a fruit: [[FRUIT]]<br />\nRun: <code>python3 example.py --key [[KEY]]</code></p>\n"
+        "<p>Paste:<br />\nTest 1: [SUBTASK1]<br />\nTest 2: [SUBTASK2]</p>\n",
+    ),
+]
+
+UNSUPPORTED = [
+    "# Header",
+    "- list item",
+    "1. ordered item",
+    "> quote",
+    "[link](https://example.com)",
+    "_emphasis_",
+    "*emphasis*",
+    '"smart quotes"',
+    "a -- b",
+    "<b>raw html</b>",
+    "| a | b |",
+    "    indented code",
+    "Text\n```\ncode\n```",
+    "```python\ncode\n```",
+    "```\nunclosed",
+    "e.g. this",
+    "$x^2$",
+]
+
+
+@pytest.mark.parametrize("markdown, html", [case[1:] for case in GOLDEN], ids=[case[0] for case in GOLDEN])
+def test_matches_pandoc_golden(markdown: str, html: str) -> None:
+    assert markdown_to_html(markdown) == html
+
+
+@pytest.mark.parametrize("markdown", UNSUPPORTED)
+def test_rejects_unsupported(markdown: str) -> None:
+    assert markdown_to_html(markdown) is None
+
+
+@pytest.mark.skipif(shutil.which("pandoc") is None, reason="pandoc is not installed")
+@pytest.mark.parametrize("markdown", [case[1] for case in GOLDEN], ids=[case[0] for case in GOLDEN])
+def test_matches_live_pandoc(markdown: str) -> None:
+    pandoc = subprocess.run(
+        ["pandoc", "--wrap=none", "-f", "markdown", "-t", "html"],
+        input=markdown,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert markdown_to_html(markdown) == pandoc.stdout
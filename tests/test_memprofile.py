@@ -0,0 +1,20 @@
+import tracemalloc
+
+from canvas_quiz_generator.memprofile import MemoryProfiler
+
+
+def test_nested_stages() -> None:
+    profiler = MemoryProfiler()
+    try:
+        with profiler.stage("outer"):
+            with profiler.stage("inner"):
+                data = [bytes(1000) for _ in range(1000)]
+            del data
+    finally:
+        profiler.stop()
+
+    assert not tracemalloc.is_tracing()
+    inner, outer = profiler.stages
+    assert (inner.name, outer.name) == ("inner", "outer")
+    assert inner.peak_bytes >= 1000 * 1000
+    assert outer.peak_bytes >= inner.peak_bytes
@@ -0,0 +1,210 @@
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import threading
+from typing import Any
+import urllib.parse
+
+import pytest
+
+from canvas_quiz_generator import publish
+from canvas_quiz_generator.publish import CanvasClient
+
+
+class MockCanvas(ThreadingHTTPServer):
+    """A Canvas instance implementing the content migration API, also acting as the file storage."""
+
+    def __init__(self, progress_states: list[str]) -> None:
+        super().__init__(("127.0.0.1", 0), _MockCanvasHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.progress_states = progress_states
+        """The states reported by the consecutive polls of the progress, the last one being repeated."""
+        self.requests: list[tuple[str, str, dict[str, str], bytes]] = []
+        self.polls = 0
+
+
+class _MockCanvasHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockCanvas
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append(("POST", self.path, dict(self.headers), body))
+        if self.path == "/api/v1/courses/42/content_migrations":
+            self._send_json(
+                {
+                    "id": 1,
+                    "workflow_state": "pre_processing",
+                    "progress_url": f"{self.server.url}/api/v1/progress/1",
+                    "pre_attachment": {
+                        # The file storage is on another host, which must not receive the access token
+                        "upload_url": self.server.url.replace("127.0.0.1", "localhost") + "/upload/1",
+                        "upload_params": {"key": "uploads/1"},
+                        "file_param": "attachment",
+                    },
+                }
+            )
+        elif self.path == "/api/v1/courses/13/content_migrations":
+            # The request is processed, but the connection is lost before the response is sent
+            self.close_connection = True
+        elif self.path == "/upload/1":
+            self.send_response(302)
+            self.send_header("Location", "/api/v1/files/1/create_success")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self._send_json({}, 404)
+
+    def do_GET(self) -> None:
+        self.server.requests.append(("GET", self.path, dict(self.headers), b""))
+        if self.path == "/api/v1/files/1/create_success":
+            self._send_json({"id": 1})
+        elif self.path == "/api/v1/users/self":
+            self._send_json({"id": 7})
+            # The server closes the connection without telling the client, like after an idle timeout
+            self.close_connection = True
+        elif self.path == "/api/v1/progress/1":
+            states = self.server.progress_states
+            state = states[min(self.server.polls, len(states) - 1)]
+            self.server.polls += 1
+            self._send_json({"workflow_state": state, "message": "Import error" if state == "failed" else None})
+        else:
+            self._send_json({}, 404)
+
+    def _send_json(self, data: dict[str, Any], status: int = 200) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(autouse=True)
+def _fast_polling(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(publish, "_POLL_INTERVAL", 0.01)
+
+
+@pytest.fixture
+def package(tmp_path: Path) -> Path:
+    path = tmp_path / "quiz_bank_export.zip"
+    path.write_bytes(b"PK\x03\x04" + bytes(range(256)) * 10)
+    return path
+
+
+def _serve(progress_states: list[str]) -> Iterator[MockCanvas]:
+    server = MockCanvas(progress_states)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@pytest.fixture
+def canvas() -> Iterator[MockCanvas]:
+    yield from _serve(["queued", "running", "completed"])
+
+
+@pytest.fixture
+def failing_canvas() -> Iterator[MockCanvas]:
+    yield from _serve(["running", "failed"])
+
+
+@pytest.fixture
+def stuck_canvas() -> Iterator[MockCanvas]:
+    yield from _serve(["running"])
+
+
+def test_import_package(canvas: MockCanvas, package: Path) -> None:
+    client = CanvasClient(canvas.url, "secret")
+    try:
+        assert client.import_package("42", package) == "completed"
+    finally:
+        client.close()
+
+    (_, create, create_headers, create_body), (_, upload, upload_headers, upload_body) = canvas.requests[:2]
+    assert create == "/api/v1/courses/42/content_migrations"
+    assert create_headers["Authorization"] == "Bearer secret"
+    assert urllib.parse.parse_qs(create_body.decode("utf-8")) == {
+        "migration_type": ["qti_converter"],
+        "pre_attachment[name]": ["quiz_bank_export.zip"],
+        "pre_attachment[size]": [str(package.stat().st_size)],
+        "pre_attachment[content_type]": ["application/zip"],
+    }
+
+    assert upload == "/upload/1"
+    assert "Authorization" not in upload_headers
+    boundary = upload_headers["Content-Type"].split("boundary=")[1]
+    assert upload_body.startswith(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="key"\r\n\r\nuploads/1\r\n'.encode()
+    )
+    assert b'name="attachment"; filename="quiz_bank_export.zip"' in upload_body
+    assert b"\r\n\r\n" + package.read_bytes() + f"\r\n--{boundary}--\r\n".encode() in upload_body
+
+    assert [path for _, path, _, _ in canvas.requests[2:]] == [
+        "/api/v1/files/1/create_success",
+        "/api/v1/progress/1",
+        "/api/v1/progress/1",
+        "/api/v1/progress/1",
+    ]
+
+
+def test_import_package_without_waiting(canvas: MockCanvas, package: Path) -> None:
+    client = CanvasClient(canvas.url, "secret")
+    try:
+        assert client.import_package("42", package, wait=False) == "pre_processing"
+    finally:
+        client.close()
+    assert canvas.polls == 0
+
+
+def test_import_package_failed(failing_canvas: MockCanvas, package: Path) -> None:
+    client = CanvasClient(failing_canvas.url, "secret")
+    try:
+        with pytest.raises(RuntimeError, match="failed to import 'quiz_bank_export.zip': Import error"):
+            client.import_package("42", package)
+    finally:
+        client.close()
+    assert failing_canvas.polls == 2
+
+
+def test_import_package_timeout(stuck_canvas: MockCanvas, package: Path) -> None:
+    client = CanvasClient(stuck_canvas.url, "secret", import_timeout=0.1)
+    try:
+        with pytest.raises(RuntimeError, match="didn't finish in 0.1 seconds"):
+            client.import_package("42", package)
+    finally:
+        client.close()
+
+
+def test_idempotent_request_is_retried_on_closed_connection(canvas: MockCanvas) -> None:
+    client = CanvasClient(canvas.url, "secret")
+    try:
+        assert client._json("GET", f"{canvas.url}/api/v1/users/self") == {"id": 7}
+        # The idle connection was closed by the server, the request is sent again on a new one
+        assert client._json("GET", f"{canvas.url}/api/v1/users/self") == {"id": 7}
+    finally:
+        client.close()
+    assert [path for _, path, _, _ in canvas.requests] == ["/api/v1/users/self"] * 2
+
+
+def test_post_is_not_retried(canvas: MockCanvas, package: Path) -> None:
+    client = CanvasClient(canvas.url, "secret")
+    try:
+        # Leaves an idle connection behind, which must not be used by the POST
+        client._json("GET", f"{canvas.url}/api/v1/files/1/create_success")
+        with pytest.raises(ConnectionError):
+            client.import_package("13", package)
+    finally:
+        client.close()
+    assert [path for method, path, _, _ in canvas.requests if method == "POST"] == [
+        "/api/v1/courses/13/content_migrations"
+    ]
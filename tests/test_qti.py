@@ -0,0 +1,37 @@
+from pathlib import Path
+import re
+
+import pytest
+
+from canvas_quiz_generator import qtiConverterApp
+
+
+def _legacy_blocks(path: Path) -> list[str]:
+    """The question blocks read by the original loadBank, which applied regex passes to the whole file."""
+    with path.open(mode="r", encoding="utf-8-sig") as f:
+        data = f.read()
+    data = re.sub(r"\ +\n", "\n", data.strip(), flags=re.MULTILINE)
+    data = re.sub("\t+\n", "\n", data.strip(), flags=re.MULTILINE)
+    data = re.sub(r"^[\ \t]+", "", data.strip(), flags=re.MULTILINE)
+    data = re.sub("^#.*$", "", data.strip(), flags=re.MULTILINE)
+    data = re.sub("\n{3,100}", "\n\n", data.strip(), flags=re.MULTILINE)
+    return data.split("\n\n")
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "MB\n1. Question [A]\nA: answer\n\nMB\n1. Other [A]\nA: other\n",
+        "MB\r\n1. Question [A]\r\nA: answer\r\n\r\nMC\r\n1. Choose\r\n*a. yes\r\nb. no\r\n",
+        "\n\n\nMB\n1. Question [A]\nA: answer\n\n\n\n\nMB\n1. Other [A]\nA: other\n\n\n",
+        "\tMB \n  1. Question [A]\t\n\t A: answer  \n\n\t\n \nMB\t\t\n1. Other [A] \t \nA: other\t",
+        "\ufeffMB\n1. Question\n# a comment\nA: answer\n\n# comment between\n\nMB\n1. Other\nA: other",
+        "MB\n1. Keep   inner   spaces\tand tabs [A]\nA: x",
+    ],
+    ids=["simple", "crlf", "blank_lines", "tabs_and_spaces", "comments", "inner_whitespace"],
+)
+def test_normalize_lines_matches_legacy_load_bank(tmp_path: Path, text: str) -> None:
+    path = tmp_path / "quiz_bank.txt"
+    path.write_bytes(text.encode("utf-8"))
+
+    assert list(qtiConverterApp.makeQti(str(path), ".", preview=False).loadBank()) == _legacy_blocks(path)